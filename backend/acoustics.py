@@ -0,0 +1,35 @@
+"""
+Acoustic stage of the voice analysis pipeline: VAD, timing metrics and features.
+
+Lives outside server.py so it can run in a worker process (AUDIO_PROCESSES)
+without importing the web app there.
+"""
+from typing import Any, Dict, Tuple
+import logging
+import numpy as np
+import vad
+import feature_extractor
+
+logger = logging.getLogger(__name__)
+
+
+def analyze_acoustics(audio: np.ndarray, sr: int, duration: float) -> Tuple[np.ndarray, Dict[str, Any], Dict[str, Any]]:
+    """
+    Voice Activity Detection, timing metrics and acoustic features (blocking).
+
+    Returns:
+        Tuple of (segments as a vad.SEGMENT_DTYPE array, timing_metrics, acoustic_features)
+    """
+    # 2. Voice Activity Detection and timing analysis
+    logger.info("Step 2: Running Voice Activity Detection...")
+    segments = vad.segment_speech(audio, sr)
+    logger.info(f"VAD found {len(segments)} speech segments")
+    timing_metrics = vad.compute_timing_metrics(segments, duration)
+    logger.info(f"Timing metrics computed: {timing_metrics}")
+
+    # 3. Extract all acoustic features
+    logger.info("Step 3: Extracting acoustic features...")
+    acoustic_features = feature_extractor.extract_all_features(audio, sr, segments)
+    logger.info(f"Acoustic features extracted: prosody keys={list(acoustic_features.get('prosody', {}).keys())}")
+
+    return segments, timing_metrics, acoustic_features
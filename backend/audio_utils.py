@@ -2,13 +2,23 @@
 Audio utilities for loading, converting, and preprocessing audio files.
 """
 import base64
+import io
+import math
 import tempfile
 import os
+import re
 import logging
 from typing import Tuple, Optional
 import numpy as np
 import soundfile as sf
+import soxr
 import librosa
+from numba import config as numba_config, njit
+
+try:
+    import pybase64 as b64  # SIMD-accelerated, same API as stdlib base64
+except ImportError:
+    b64 = base64
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +27,16 @@ MAX_AUDIO_SIZE_MB = 25  # Maximum base64 decoded size in MB
 MAX_DURATION_SECONDS = 300  # Maximum 5 minutes
 MIN_DURATION_SECONDS = 1  # Minimum 1 second
 
+# Base64 characters decoded per chunk (a multiple of 4 keeps chunks quantum-aligned)
+BASE64_CHUNK_CHARS = 4 * 256 * 1024
+
+# Line breaks/spaces in MIME-wrapped base64; removed before chunking so the
+# chunk boundaries stay on 4-character quanta
+_BASE64_WHITESPACE = re.compile(r"\s+")
+
+# Formats libsndfile can decode straight from memory (no temp file needed)
+SOUNDFILE_FORMATS = {'.wav', '.flac', '.ogg'}
+
 
 def detect_audio_format(audio_bytes: bytes) -> str:
     """
@@ -57,8 +77,20 @@ def validate_audio_size(base64_str: str) -> None:
         ValueError: If audio exceeds size limit
     """
     # Base64 is ~4/3 the size of raw bytes
-    estimated_bytes = len(base64_str) * 3 / 4
-    estimated_mb = estimated_bytes / (1024 * 1024)
+    validate_audio_size_bytes(len(base64_str) * 3 / 4)
+
+
+def validate_audio_size_bytes(size_bytes: float) -> None:
+    """
+    Validate a (decoded or estimated) audio size against MAX_AUDIO_SIZE_MB.
+    
+    Args:
+        size_bytes: Audio size in bytes
+        
+    Raises:
+        ValueError: If audio exceeds size limit
+    """
+    estimated_mb = size_bytes / (1024 * 1024)
     
     if estimated_mb > MAX_AUDIO_SIZE_MB:
         raise ValueError(
@@ -66,6 +98,46 @@ def validate_audio_size(base64_str: str) -> None:
         )
 
 
+def decode_base64_audio(base64_str: str, max_bytes: int = MAX_AUDIO_SIZE_MB * 1024 * 1024) -> bytearray:
+    """
+    Decode base64 audio in fixed-size chunks into a buffer capped at max_bytes.
+    
+    Decoding stops as soon as the output would exceed the cap, so an
+    oversize or malformed payload is rejected without materializing all of it.
+    Whitespace (e.g. MIME line wrapping) is stripped first.
+    
+    Args:
+        base64_str: Base64 encoded audio data
+        max_bytes: Maximum decoded size in bytes
+        
+    Returns:
+        Decoded audio bytes
+        
+    Raises:
+        ValueError: If the decoded audio exceeds max_bytes
+        binascii.Error: If the payload is not valid base64
+    """
+    if _BASE64_WHITESPACE.search(base64_str):
+        base64_str = _BASE64_WHITESPACE.sub("", base64_str)
+    
+    # 3 bytes per 4 chars is an upper bound on the decoded size
+    buf = bytearray(min(len(base64_str) * 3 // 4, max_bytes))
+    written = 0
+    
+    for start in range(0, len(base64_str), BASE64_CHUNK_CHARS):
+        chunk = b64.b64decode(base64_str[start:start + BASE64_CHUNK_CHARS], validate=False)
+        end = written + len(chunk)
+        if end > len(buf):
+            raise ValueError(
+                f"Audio file too large: exceeds {max_bytes / (1024 * 1024):.1f}MB limit"
+            )
+        buf[written:end] = chunk
+        written = end
+    
+    del buf[written:]
+    return buf
+
+
 def validate_audio_duration(audio: np.ndarray, sr: int) -> None:
     """
     Validate that audio duration is within acceptable limits.
@@ -104,27 +176,72 @@ def load_audio_from_base64(base64_str: str, target_sr: int = 16000) -> Tuple[np.
     Raises:
         ValueError: If audio is invalid, too large, or duration out of bounds
     """
+    audio_bytes = decode_base64_payload(base64_str)
+    return load_audio_from_bytes(audio_bytes, target_sr=target_sr)
+
+
+def decode_base64_payload(base64_str: str) -> bytearray:
+    """
+    Size-check and decode a base64 audio payload.
+    
+    Args:
+        base64_str: Base64 encoded audio data
+        
+    Returns:
+        Decoded audio file bytes
+        
+    Raises:
+        ValueError: If the payload is too large or not valid base64
+    """
     # Validate size before decoding
     validate_audio_size(base64_str)
     
-    temp_path: Optional[str] = None
-    
     try:
         # Decode base64 to bytes
-        audio_bytes = base64.b64decode(base64_str)
+        return decode_base64_audio(base64_str)
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to load audio from base64: {str(e)}")
+        raise ValueError(f"Failed to load audio from base64: {str(e)}")
+
+
+def load_audio_from_bytes(audio_bytes: bytes, target_sr: int = 16000) -> Tuple[np.ndarray, int]:
+    """
+    Load audio from raw encoded bytes (e.g. a multipart upload).
+    
+    Args:
+        audio_bytes: Encoded audio file contents
+        target_sr: Target sample rate (default 16000 Hz)
         
+    Returns:
+        Tuple of (audio_array, sample_rate)
+        
+    Raises:
+        ValueError: If audio is invalid, too large, or duration out of bounds
+    """
+    if len(audio_bytes) > MAX_AUDIO_SIZE_MB * 1024 * 1024:
+        raise ValueError(f"Audio file too large: exceeds {MAX_AUDIO_SIZE_MB}MB limit")
+    
+    try:
         # Detect format from content
         file_extension = detect_audio_format(audio_bytes)
         logger.info(f"Detected audio format: {file_extension}")
         
-        # Create temporary file with correct extension
-        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=file_extension)
-        temp_path = temp_file.name
-        temp_file.write(audio_bytes)
-        temp_file.close()
+        audio = None
+        sr = target_sr
+        if file_extension in SOUNDFILE_FORMATS:
+            try:
+                audio = _decode_with_soundfile(audio_bytes, target_sr)
+            except RuntimeError as e:
+                # libsndfile can't handle every variant (e.g. Opus in Ogg)
+                logger.warning(f"soundfile decode failed, falling back to librosa: {e}")
         
-        # Load audio using librosa
-        audio, sr = librosa.load(temp_path, sr=target_sr, mono=True)
+        if audio is None:
+            audio, sr = _decode_with_librosa(audio_bytes, file_extension, target_sr)
+        
+        # Keep everything downstream in contiguous float32
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
         
         # Validate duration
         validate_audio_duration(audio, sr)
@@ -138,8 +255,112 @@ def load_audio_from_base64(base64_str: str, target_sr: int = 16000) -> Tuple[np.
         # Re-raise validation errors as-is
         raise
     except Exception as e:
-        logger.error(f"Failed to load audio from base64: {str(e)}")
-        raise ValueError(f"Failed to load audio from base64: {str(e)}")
+        logger.error(f"Failed to decode audio: {str(e)}")
+        raise ValueError(f"Failed to decode audio: {str(e)}")
+
+
+class _BufferReader(io.RawIOBase):
+    """
+    Read-only file object over an in-memory buffer.
+    
+    Unlike io.BytesIO, wrapping a bytearray doesn't copy it, so soundfile
+    decodes straight out of the base64 output buffer.
+    """
+    
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def readinto(self, b) -> int:
+        start = min(self._pos, len(self._view))
+        n = min(len(b), len(self._view) - start)
+        b[:n] = self._view[start:start + n]
+        self._pos = start + n
+        return n
+    
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._pos = offset
+        return self._pos
+    
+    def tell(self) -> int:
+        return self._pos
+
+
+def _decode_with_soundfile(audio_bytes: bytearray, target_sr: int) -> np.ndarray:
+    """
+    Decode audio in-memory with soundfile and resample with soxr.
+    
+    Args:
+        audio_bytes: Raw audio bytes (wav/flac/ogg)
+        target_sr: Target sample rate
+        
+    Returns:
+        Mono float32 audio array at target_sr
+    """
+    with sf.SoundFile(_BufferReader(audio_bytes)) as snd:
+        data = snd.read(dtype='float32', always_2d=False)
+        native_sr = snd.samplerate
+    
+    # Downmix to mono
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+    
+    if native_sr != target_sr:
+        data = soxr.resample(data, native_sr, target_sr, quality='HQ')
+    
+    return data
+
+
+def _decode_with_librosa(audio_bytes: bytearray, file_extension: str, target_sr: int) -> Tuple[np.ndarray, int]:
+    """
+    Decode audio with librosa (audioread/ffmpeg) for codecs libsndfile
+    doesn't support (m4a, mp3, webm).
+    
+    librosa needs a path, so on Linux the bytes go into an anonymous
+    RAM-backed memfd; elsewhere they go into a temp file.
+    
+    Args:
+        audio_bytes: Raw audio bytes
+        file_extension: Detected file extension
+        target_sr: Target sample rate
+        
+    Returns:
+        Tuple of (audio_array, sample_rate)
+    """
+    if hasattr(os, "memfd_create"):
+        fd = os.memfd_create("audio", os.MFD_CLOEXEC)
+        try:
+            with open(fd, "wb", closefd=False) as memfile:
+                memfile.write(audio_bytes)
+            # /proc/<pid> rather than /proc/self so an ffmpeg subprocess can open it too
+            return librosa.load(f"/proc/{os.getpid()}/fd/{fd}", sr=target_sr, mono=True)
+        finally:
+            os.close(fd)
+    
+    temp_path: Optional[str] = None
+    
+    try:
+        # Create temporary file with correct extension
+        temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=file_extension)
+        temp_path = temp_file.name
+        temp_file.write(audio_bytes)
+        temp_file.close()
+        
+        # Load audio using librosa
+        return librosa.load(temp_path, sr=target_sr, mono=True)
+        
     finally:
         # Always clean up temp file
         if temp_path and os.path.exists(temp_path):
@@ -149,6 +370,29 @@ def load_audio_from_base64(base64_str: str, target_sr: int = 16000) -> Tuple[np.
                 logger.warning(f"Failed to clean up temp file {temp_path}: {cleanup_error}")
 
 
+# Serial on purpose: it is called from several audio_executor threads at once,
+# which numba's fallback workqueue threading layer doesn't allow for
+# parallel=True kernels, and the two passes are memory-bound anyway
+@njit(fastmath=True, cache=True)
+def _normalize_kernel(audio: np.ndarray, target_level: float, out: np.ndarray) -> None:
+    """Fused RMS + scale + clip: one pass to measure, one pass to write."""
+    n = audio.size
+    sum_sq = 0.0
+    for i in range(n):
+        sum_sq += audio[i] * audio[i]
+    
+    rms = math.sqrt(sum_sq / n) if n > 0 else 0.0
+    scaling_factor = target_level / rms if rms > 0 else 1.0
+    
+    for i in range(n):
+        v = audio[i] * scaling_factor
+        if v > 1.0:
+            v = 1.0
+        elif v < -1.0:
+            v = -1.0
+        out[i] = v
+
+
 def normalize_audio(audio: np.ndarray, target_level: float = 0.3) -> np.ndarray:
     """
     Normalize audio levels to prevent clipping and ensure consistent volume.
@@ -158,20 +402,31 @@ def normalize_audio(audio: np.ndarray, target_level: float = 0.3) -> np.ndarray:
         target_level: Target RMS level (0-1)
         
     Returns:
-        Normalized audio array
+        Normalized audio array (clipped to [-1, 1])
     """
-    # Calculate current RMS
-    rms = np.sqrt(np.mean(audio**2))
+    audio = np.ascontiguousarray(audio).ravel()
     
-    if rms > 0:
-        # Scale to target level
-        scaling_factor = target_level / rms
-        audio = audio * scaling_factor
-        
-    # Clip to prevent values outside [-1, 1]
-    audio = np.clip(audio, -1.0, 1.0)
+    # With NUMBA_DISABLE_JIT the kernel would run as a per-sample Python loop
+    if numba_config.DISABLE_JIT:
+        return _normalize_numpy(audio, target_level)
     
-    return audio
+    out = np.empty_like(audio)
+    _normalize_kernel(audio, target_level, out)
+    return out
+
+
+def _normalize_numpy(audio: np.ndarray, target_level: float) -> np.ndarray:
+    """Numpy equivalent of _normalize_kernel with no temporaries beyond the output."""
+    out = audio.copy()
+    
+    if audio.size > 0:
+        # einsum reduces the sum of squares without materializing audio**2
+        rms = math.sqrt(float(np.einsum('i,i->', audio, audio)) / audio.size)
+        if rms > 0:
+            np.multiply(out, target_level / rms, out=out)
+    
+    np.clip(out, -1.0, 1.0, out=out)
+    return out
 
 
 def save_temp_wav(audio: np.ndarray, sr: int) -> str:
@@ -194,6 +449,22 @@ def save_temp_wav(audio: np.ndarray, sr: int) -> str:
     return temp_path
 
 
+def encode_wav(audio: np.ndarray, sr: int) -> bytes:
+    """
+    Encode audio array as WAV bytes in memory.
+    
+    Args:
+        audio: Audio array
+        sr: Sample rate
+        
+    Returns:
+        WAV file contents (16-bit PCM)
+    """
+    buf = io.BytesIO()
+    sf.write(buf, audio, sr, format='WAV', subtype='PCM_16')
+    return buf.getvalue()
+
+
 def get_audio_duration(audio: np.ndarray, sr: int) -> float:
     """
     Calculate audio duration in seconds.
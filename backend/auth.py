@@ -2,22 +2,54 @@ from datetime import datetime, timezone, timedelta
 from typing import Optional
 from fastapi import HTTPException, Request, Response
 from motor.motor_asyncio import AsyncIOMotorClient
+from cachetools import TTLCache
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import httpx
+import logging
 import os
+from db_indexes import create_indexes
+
+logger = logging.getLogger(__name__)
 
 # Session validation endpoint
 EMERGENT_SESSION_API = "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data"
 
+# In-process session_token -> user cache (staleness bounded by the TTL)
+SESSION_CACHE_SIZE = 10_000
+SESSION_CACHE_TTL_SECONDS = 60
+
 class AuthService:
     def __init__(self, db: AsyncIOMotorClient):
         self.db = db
+        self._session_cache = TTLCache(maxsize=SESSION_CACHE_SIZE, ttl=SESSION_CACHE_TTL_SECONDS)
+        # Shared client keeps the TLS connection to the session API alive across logins
+        self._http = httpx.AsyncClient(
+            timeout=10.0,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
     
-    async def get_current_user(self, request: Request):
+    async def close(self):
+        """Close the pooled HTTP client (call on app shutdown)."""
+        await self._http.aclose()
+    
+    async def ensure_indexes(self):
         """
-        Get current user from session token
-        Checks both cookie and Authorization header
+        Create the indexes the auth lookups rely on (idempotent).
+        Names match migrations/add_unique_indexes.py so either can run first.
         """
-        # Try cookie first (preferred)
+        await create_indexes([
+            (self.db.users, "email", {"unique": True, "name": "unique_email"}),
+            (self.db.users, "id", {"unique": True, "name": "unique_user_id"}),
+            (self.db.user_sessions, "session_token", {"unique": True, "name": "unique_session_token"}),
+            (self.db.user_sessions, "user_id", {"name": "idx_user_id"}),
+            # TTL index: Mongo deletes sessions once expires_at passes
+            (self.db.user_sessions, "expires_at", {"expireAfterSeconds": 0, "name": "ttl_expires_at"}),
+        ])
+    
+    @staticmethod
+    def _session_token(request: Request) -> Optional[str]:
+        """Session token from the cookie (preferred) or the Authorization header"""
         session_token = request.cookies.get("session_token")
         
         # Fallback to Authorization header
@@ -26,20 +58,64 @@ class AuthService:
             if auth_header.startswith("Bearer "):
                 session_token = auth_header.replace("Bearer ", "")
         
+        return session_token or None
+    
+    def cached_user_id(self, request: Request) -> Optional[str]:
+        """
+        Id of the request's user if their session was validated recently.
+        Never touches the database; unknown or forged tokens give None.
+        """
+        session_token = self._session_token(request)
+        user = self._session_cache.get(session_token) if session_token else None
+        return user["id"] if user else None
+    
+    async def get_current_user(self, request: Request):
+        """
+        Get current user from session token
+        Checks both cookie and Authorization header
+        """
+        session_token = self._session_token(request)
+        
         if not session_token:
             raise HTTPException(status_code=401, detail="Not authenticated")
         
-        # Check if session exists and is valid
-        session = await self.db.user_sessions.find_one({
-            "session_token": session_token,
-            "expires_at": {"$gt": datetime.now(timezone.utc)}
-        })
+        # Already resolved earlier in this request
+        request_user = getattr(request.state, "user", None)
+        if request_user is not None:
+            return dict(request_user)
+        
+        user = self._session_cache.get(session_token)
+        if user is None:
+            user = await self._lookup_session_user(session_token)
+            self._session_cache[session_token] = user
         
-        if not session:
+        request.state.user = user
+        return dict(user)
+    
+    async def _lookup_session_user(self, session_token: str) -> dict:
+        """
+        Resolve a valid session to its user in a single round trip
+        """
+        # Session match + user join in one aggregate instead of two find_one calls
+        sessions = await self.db.user_sessions.aggregate([
+            {"$match": {
+                "session_token": session_token,
+                "expires_at": {"$gt": datetime.now(timezone.utc)}
+            }},
+            {"$limit": 1},
+            {"$lookup": {
+                "from": "users",
+                "localField": "user_id",
+                "foreignField": "id",
+                "as": "user"
+            }},
+            {"$project": {"_id": 0, "user": {"$arrayElemAt": ["$user", 0]}}}
+        ]).to_list(1)
+        
+        if not sessions:
             raise HTTPException(status_code=401, detail="Session expired or invalid")
         
-        # Get user data
-        user = await self.db.users.find_one({"id": session["user_id"]})
+        user = sessions[0].get("user")
         
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
@@ -54,90 +130,61 @@ class AuthService:
         This function is idempotent - calling it multiple times with the same session_id
         will only create one user and one session.
         """
-        async with httpx.AsyncClient() as client:
-            api_response = await client.get(
-                EMERGENT_SESSION_API,
-                headers={"X-Session-ID": session_id},
-                timeout=10.0
+        api_response = await self._http.get(
+            EMERGENT_SESSION_API,
+            headers={"X-Session-ID": session_id}
+        )
+        
+        if api_response.status_code != 200:
+            raise HTTPException(
+                status_code=401, 
+                detail="Failed to validate session"
             )
-            
-            if api_response.status_code != 200:
-                raise HTTPException(
-                    status_code=401, 
-                    detail="Failed to validate session"
-                )
-            
-            user_data = api_response.json()
         
-        session_token = user_data["session_token"]
+        user_data = api_response.json()
         
-        # IDEMPOTENCY CHECK: Check if session already exists
-        existing_session = await self.db.user_sessions.find_one({
-            "session_token": session_token
-        })
-        
-        if existing_session:
-            # Session already exists - return existing user data
-            existing_user = await self.db.users.find_one({"id": existing_session["user_id"]})
-            if existing_user:
-                existing_user.pop("_id", None)
-                return {
-                    "id": existing_user["id"],
-                    "email": existing_user["email"],
-                    "name": existing_user["name"],
-                    "picture": existing_user.get("picture"),
-                    "session_token": session_token
-                }
+        session_token = user_data["session_token"]
         
-        # Check if user exists by email (idempotent check)
-        existing_user = await self.db.users.find_one({"email": user_data["email"]})
-        
-        if not existing_user:
-            # Use upsert to prevent duplicate user creation in race conditions
-            # Try to insert, but if duplicate key error, fetch existing
-            try:
-                user_doc = {
-                    "id": user_data["id"],
-                    "email": user_data["email"],
-                    "name": user_data["name"],
-                    "picture": user_data.get("picture"),
-                    "created_at": datetime.now(timezone.utc)
-                }
-                await self.db.users.insert_one(user_doc)
-            except Exception as e:
-                # If insert fails (e.g., duplicate key error), fetch existing user
-                # MongoDB duplicate key error code is 11000
-                error_str = str(e)
-                if "duplicate key" in error_str.lower() or "E11000" in error_str:
-                    existing_user = await self.db.users.find_one({"email": user_data["email"]})
-                    if existing_user:
-                        user_data["id"] = existing_user["id"]
-                    else:
-                        # Try by id as fallback
-                        existing_user = await self.db.users.find_one({"id": user_data["id"]})
-                        if existing_user:
-                            user_data["id"] = existing_user["id"]
-                        else:
-                            # Re-raise if we can't find the user
-                            raise
-                else:
-                    # Re-raise if it's not a duplicate error
-                    raise
-        else:
-            user_data["id"] = existing_user["id"]
+        # Resolve (or create) the user in one round trip. $setOnInsert leaves an
+        # existing account untouched, and the unique email index makes this
+        # race-safe without a separate find -> insert step.
+        now = datetime.now(timezone.utc)
+        try:
+            user = await self.db.users.find_one_and_update(
+                {"email": user_data["email"]},
+                {
+                    "$setOnInsert": {
+                        "id": user_data["id"],
+                        "email": user_data["email"],
+                        "name": user_data["name"],
+                        "picture": user_data.get("picture"),
+                        "created_at": now
+                    }
+                },
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Lost an upsert race, or the id already belongs to an account
+            user = (
+                await self.db.users.find_one({"email": user_data["email"]})
+                or await self.db.users.find_one({"id": user_data["id"]})
+            )
+            if not user:
+                raise
         
         # Create session only if it doesn't exist (idempotent)
-        expires_at = datetime.now(timezone.utc) + timedelta(days=7)
+        expires_at = now + timedelta(days=7)
         
         # Use update_one with upsert to prevent duplicate sessions
         await self.db.user_sessions.update_one(
             {"session_token": session_token},
             {
                 "$setOnInsert": {
-                    "user_id": user_data["id"],
+                    "user_id": user["id"],
                     "session_token": session_token,
                     "expires_at": expires_at,
-                    "created_at": datetime.now(timezone.utc)
+                    "created_at": now
                 }
             },
             upsert=True
@@ -155,10 +202,10 @@ class AuthService:
         )
         
         return {
-            "id": user_data["id"],
-            "email": user_data["email"],
-            "name": user_data["name"],
-            "picture": user_data.get("picture"),
+            "id": user["id"],
+            "email": user["email"],
+            "name": user["name"],
+            "picture": user.get("picture"),
             "session_token": session_token  # Include token in response for React Native
         }
     
@@ -166,16 +213,10 @@ class AuthService:
         """
         Logout user and clear session
         """
-        # Try cookie first
-        session_token = request.cookies.get("session_token")
-        
-        # Fallback to Authorization header
-        if not session_token:
-            auth_header = request.headers.get("Authorization", "")
-            if auth_header.startswith("Bearer "):
-                session_token = auth_header.replace("Bearer ", "")
+        session_token = self._session_token(request)
         
         if session_token:
+            self._session_cache.pop(session_token, None)
             # Delete session from database
             await self.db.user_sessions.delete_one({"session_token": session_token})
         
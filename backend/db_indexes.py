@@ -0,0 +1,23 @@
+"""
+Startup index creation shared by the auth and assessment collections.
+"""
+from typing import Any, Dict, Iterable, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (collection, keys, create_index kwargs); kwargs always carries the index name
+IndexSpec = Tuple[Any, Any, Dict[str, Any]]
+
+
+async def create_indexes(indexes: Iterable[IndexSpec]) -> None:
+    """
+    Create each index on its own (idempotent), so one conflict doesn't skip the rest.
+    Failures (e.g. existing duplicates, or an index with other options under that name)
+    are logged and never block startup; lookups still work, just slower.
+    """
+    for collection, keys, kwargs in indexes:
+        try:
+            await collection.create_index(keys, **kwargs)
+        except Exception as e:
+            logger.warning(f"Failed to create index {kwargs['name']} on {collection.name}: {e}")
@@ -1,11 +1,18 @@
 """
 Acoustic feature extraction: prosody, loudness, quality, and spectral features.
 """
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
 import logging
+import os
 import numpy as np
 import librosa
 
+try:
+    import pyworld as pw
+except ImportError:  # Optional: pitch tracking falls back to librosa.pyin
+    pw = None
+
 logger = logging.getLogger(__name__)
 
 # Prosody thresholds (Hz)
@@ -22,27 +29,111 @@ DYNAMIC_RANGE_MEDIUM = 8    # Normal dynamic range
 HNR_EXCELLENT = 15          # Excellent voice quality
 HNR_GOOD = 10               # Good voice quality
 
+# STFT parameters shared by all spectrogram-based features (librosa defaults)
+N_FFT = 2048
+HOP_LENGTH = 512
+
+# F0 search range (Hz) - low enough for deep voices/fry, high enough for the upper range
+PITCH_FMIN = 50
+PITCH_FMAX = 3000
+
+# Pitch tracker used when callers don't choose: fast (WORLD DIO, else yin with
+# an energy gate) by default; FAST_PITCH=0 restores pyin, the original tracker.
+# The trackers' voicing decisions differ, so pitch stats shift slightly between them.
+FAST_PITCH = os.environ.get("FAST_PITCH", "1") != "0"
+
+# yin voicing gate: frames quieter than this fraction of the loudest frame
+# (or this absolute RMS) are treated as unvoiced
+PITCH_ENERGY_GATE = 0.05
+PITCH_ENERGY_FLOOR = 1e-4
+
+# Visualization time series: keep every Nth frame, at most this many points
+SERIES_DOWNSAMPLE = 10
+SERIES_MAX_POINTS = 200
+
+# Threads shared by every extract_all_features call in the process; caps total
+# extractor concurrency however many assessments are analysed at once
+FEATURE_WORKERS = int(os.environ.get("FEATURE_WORKERS", "4"))
+_feature_executor = ThreadPoolExecutor(max_workers=FEATURE_WORKERS, thread_name_prefix="features")
+
+
+def _as_float32(audio: np.ndarray) -> np.ndarray:
+    """Return audio as contiguous float32 (no copy if it already is)."""
+    return np.ascontiguousarray(audio, dtype=np.float32)
 
-def extract_prosody(audio: np.ndarray, sr: int) -> Dict:
+
+def _track_pitch(audio: np.ndarray, sr: int, fast_pitch: bool = True) -> np.ndarray:
     """
-    Extract prosodic features (pitch/F0).
-    Uses librosa's pyin algorithm for robust pitch tracking.
+    Track F0 with one value per HOP_LENGTH frame, NaN for unvoiced frames.
+    
+    Fast mode uses WORLD's DIO + StoneMask (C++) when pyworld is installed,
+    else librosa.yin with an energy gate for voicing - both several times
+    faster than pyin and accurate enough for summary stats and the
+    downsampled display series. pyin's Viterbi decoding is kept for
+    fast_pitch=False (high-quality mode).
     
     Args:
         audio: Audio array
         sr: Sample rate
+        fast_pitch: Use a fast tracker instead of pyin
         
     Returns:
-        Dictionary of prosody metrics
+        F0 contour in Hz
     """
-    try:
-        # Extract F0 using PYIN
+    if not fast_pitch:
         f0, voiced_flag, voiced_probs = librosa.pyin(
             audio,
-            fmin=50,  # Lower to 50Hz to catch deep voices/fry
-            fmax=3000,  # Increase to 3000Hz covers higher range
-            sr=sr
+            fmin=PITCH_FMIN,
+            fmax=PITCH_FMAX,
+            sr=sr,
+            hop_length=HOP_LENGTH
         )
+        return f0
+    
+    if pw is not None:
+        audio64 = audio.astype(np.float64)
+        frame_period_ms = 1000 * HOP_LENGTH / sr
+        f0, t = pw.dio(audio64, sr, f0_floor=PITCH_FMIN, f0_ceil=PITCH_FMAX,
+                       frame_period=frame_period_ms)
+        f0 = pw.stonemask(audio64, f0, t, sr)
+        # WORLD marks unvoiced frames with 0; match pyin's NaN convention
+        f0[f0 == 0] = np.nan
+        return f0
+    
+    # yin has no voicing decision, so gate out low-energy frames
+    f0 = librosa.yin(
+        audio,
+        fmin=PITCH_FMIN,
+        fmax=min(PITCH_FMAX, sr / 2),
+        sr=sr,
+        frame_length=N_FFT,
+        hop_length=HOP_LENGTH
+    ).astype(np.float64)
+    rms = librosa.feature.rms(y=audio, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+    gate = max(PITCH_ENERGY_FLOOR, PITCH_ENERGY_GATE * float(rms.max(initial=0.0)))
+    f0[rms[:len(f0)] < gate] = np.nan
+    return f0
+
+
+def extract_prosody(audio: np.ndarray, sr: int, fast_pitch: Optional[bool] = None) -> Dict:
+    """
+    Extract prosodic features (pitch/F0).
+    Uses a fast tracker (WORLD DIO or yin) or librosa's pyin in high-quality mode.
+    
+    Args:
+        audio: Audio array
+        sr: Sample rate
+        fast_pitch: Set False to force pyin (slower, more robust voicing);
+            None follows the FAST_PITCH setting
+        
+    Returns:
+        Dictionary of prosody metrics
+    """
+    try:
+        audio = _as_float32(audio)
+        
+        # Extract F0 contour
+        f0 = _track_pitch(audio, sr, fast_pitch=FAST_PITCH if fast_pitch is None else fast_pitch)
         
         # Filter out unvoiced frames (NaN values)
         f0_voiced = f0[~np.isnan(f0)]
@@ -56,24 +147,28 @@ def extract_prosody(audio: np.ndarray, sr: int) -> Dict:
                 "pitch_p50": 0,
                 "pitch_p95": 0,
                 "pitch_range_hz": 0,
-                "pitch_series": []
+                "pitch_series": {"time": [], "f0": []}
             }
         
         # Calculate statistics
         pitch_mean = float(np.mean(f0_voiced))
         pitch_std = float(np.std(f0_voiced))
-        pitch_p5 = float(np.percentile(f0_voiced, 5))
-        pitch_p50 = float(np.percentile(f0_voiced, 50))
-        pitch_p95 = float(np.percentile(f0_voiced, 95))
+        # One call -> one partition pass for all three quantiles (no full sorts)
+        pitch_p5, pitch_p50, pitch_p95 = (
+            float(p) for p in np.percentile(f0_voiced, [5, 50, 95])
+        )
         pitch_range = pitch_p95 - pitch_p5
         
-        # Create time series for visualization (downsample)
-        hop_length = 512
-        times = librosa.frames_to_time(range(len(f0)), sr=sr, hop_length=hop_length)
-        pitch_series = [
-            {"time": float(t), "f0": float(f) if not np.isnan(f) else None}
-            for t, f in zip(times[::10], f0[::10])  # Downsample for efficiency
-        ]
+        # Create time series for visualization (downsample, then cap before building dicts)
+        f0_ds = f0[::SERIES_DOWNSAMPLE][:SERIES_MAX_POINTS]
+        times_ds = librosa.frames_to_time(
+            np.arange(len(f0))[::SERIES_DOWNSAMPLE][:SERIES_MAX_POINTS], sr=sr, hop_length=HOP_LENGTH
+        )
+        # Columnar (time[], f0[]) rather than per-point dicts: smaller JSON, no dict per frame
+        pitch_series = {
+            "time": np.round(times_ds, 3).tolist(),
+            "f0": np.where(np.isnan(f0_ds), None, f0_ds).tolist()
+        }
         
         return {
             "pitch_mean": round(pitch_mean, 2),
@@ -82,7 +177,7 @@ def extract_prosody(audio: np.ndarray, sr: int) -> Dict:
             "pitch_p50": round(pitch_p50, 2),
             "pitch_p95": round(pitch_p95, 2),
             "pitch_range_hz": round(pitch_range, 2),
-            "pitch_series": pitch_series[:200]  # Limit to 200 points
+            "pitch_series": pitch_series
         }
         
     except Exception as e:
@@ -94,14 +189,32 @@ def extract_prosody(audio: np.ndarray, sr: int) -> Dict:
             "pitch_p50": 0,
             "pitch_p95": 0,
             "pitch_range_hz": 0,
-            "pitch_series": []
+            "pitch_series": {"time": [], "f0": []}
         }
 
 
+def compute_spectrogram(audio: np.ndarray) -> np.ndarray:
+    """
+    Compute the magnitude spectrogram shared across feature extractors.
+    
+    Args:
+        audio: Audio array
+        
+    Returns:
+        Magnitude spectrogram |STFT| with N_FFT / HOP_LENGTH framing
+    """
+    stft = librosa.stft(_as_float32(audio), n_fft=N_FFT, hop_length=HOP_LENGTH, dtype=np.complex64)
+    return np.abs(stft)
+
+
 def extract_loudness(audio: np.ndarray, sr: int) -> Dict:
     """
     Extract loudness and energy features.
     
+    RMS is framed in the time domain rather than taken from the shared
+    spectrogram: it needs no FFT, and the spectral estimate reads lower
+    (windowing), which would shift the scores built on these values.
+    
     Args:
         audio: Audio array
         sr: Sample rate
@@ -110,8 +223,10 @@ def extract_loudness(audio: np.ndarray, sr: int) -> Dict:
         Dictionary of loudness metrics
     """
     try:
+        audio = _as_float32(audio)
+        
         # Calculate RMS energy
-        rms = librosa.feature.rms(y=audio, frame_length=2048, hop_length=512)[0]
+        rms = librosa.feature.rms(y=audio, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
         
         if len(rms) == 0:
             logger.warning("No RMS frames extracted from audio")
@@ -119,7 +234,7 @@ def extract_loudness(audio: np.ndarray, sr: int) -> Dict:
                 "rms_mean": 0,
                 "rms_std": 0,
                 "dynamic_range_db": 0,
-                "rms_series": []
+                "rms_series": {"time": [], "rms": []}
             }
         
         # Convert to dB
@@ -130,18 +245,21 @@ def extract_loudness(audio: np.ndarray, sr: int) -> Dict:
         rms_std = float(np.std(rms))
         dynamic_range_db = float(np.max(rms_db) - np.min(rms_db))
         
-        # Create time series
-        times = librosa.frames_to_time(range(len(rms)), sr=sr, hop_length=512)
-        rms_series = [
-            {"time": float(t), "rms": float(r)}
-            for t, r in zip(times[::10], rms[::10])
-        ]
+        # Create time series (downsample, then cap before building dicts)
+        rms_ds = rms[::SERIES_DOWNSAMPLE][:SERIES_MAX_POINTS]
+        times_ds = librosa.frames_to_time(
+            np.arange(len(rms))[::SERIES_DOWNSAMPLE][:SERIES_MAX_POINTS], sr=sr, hop_length=HOP_LENGTH
+        )
+        rms_series = {
+            "time": np.round(times_ds, 3).tolist(),
+            "rms": rms_ds.tolist()
+        }
         
         return {
             "rms_mean": round(rms_mean, 4),
             "rms_std": round(rms_std, 4),
             "dynamic_range_db": round(dynamic_range_db, 2),
-            "rms_series": rms_series[:200]
+            "rms_series": rms_series
         }
         
     except Exception as e:
@@ -150,11 +268,11 @@ def extract_loudness(audio: np.ndarray, sr: int) -> Dict:
             "rms_mean": 0,
             "rms_std": 0,
             "dynamic_range_db": 0,
-            "rms_series": []
+            "rms_series": {"time": [], "rms": []}
         }
 
 
-def extract_voice_quality_librosa(audio: np.ndarray, sr: int) -> Dict:
+def extract_voice_quality_librosa(audio: np.ndarray, sr: int, S: Optional[np.ndarray] = None) -> Dict:
     """
     Extract voice quality features using librosa (proxy when Parselmouth unavailable).
     
@@ -164,23 +282,22 @@ def extract_voice_quality_librosa(audio: np.ndarray, sr: int) -> Dict:
     Args:
         audio: Audio array
         sr: Sample rate
+        S: Optional precomputed magnitude spectrogram (see compute_spectrogram)
         
     Returns:
         Dictionary of quality metrics (approximations)
     """
     try:
+        audio = _as_float32(audio)
+        
         # Spectral flatness (proxy for breathiness)
-        flatness = librosa.feature.spectral_flatness(y=audio)
+        flatness = librosa.feature.spectral_flatness(y=audio, S=S)
         flatness_mean = float(np.mean(flatness))
         
         # Zero crossing rate (proxy for jitter/roughness)
         zcr = librosa.feature.zero_crossing_rate(audio)
         zcr_mean = float(np.mean(zcr))
         
-        # Spectral rolloff (proxy for harmonic content)
-        rolloff = librosa.feature.spectral_rolloff(y=audio, sr=sr)
-        rolloff_mean = float(np.mean(rolloff))
-        
         # Estimate quality scores (normalized to typical ranges)
         # These are APPROXIMATIONS - not clinical measurements
         jitter_proxy = min(zcr_mean * 10, 5.0)  # Normalized to ~0-5% range
@@ -206,38 +323,46 @@ def extract_voice_quality_librosa(audio: np.ndarray, sr: int) -> Dict:
         }
 
 
-def extract_spectral(audio: np.ndarray, sr: int) -> Dict:
+def extract_spectral(audio: np.ndarray, sr: int, S: Optional[np.ndarray] = None) -> Dict:
     """
     Extract spectral features (MFCCs, centroid, rolloff, bandwidth).
     
     Args:
         audio: Audio array
         sr: Sample rate
+        S: Optional precomputed magnitude spectrogram (see compute_spectrogram)
         
     Returns:
         Dictionary of spectral metrics
     """
     try:
-        # MFCCs
-        mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
-        mfcc_means = [float(np.mean(mfcc)) for mfcc in mfccs]
-        mfcc_stds = [float(np.std(mfcc)) for mfcc in mfccs]
+        audio = _as_float32(audio)
+        
+        # MFCCs (mel filterbank over the power spectrogram)
+        if S is not None:
+            mel = librosa.feature.melspectrogram(S=S**2, sr=sr)
+            mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=13)
+        else:
+            mfccs = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
+        # Per-coefficient stats in one reduction each (float64 so rounding stays exact)
+        mfcc_means = np.round(mfccs.mean(axis=1, dtype=np.float64), 3).tolist()
+        mfcc_stds = np.round(mfccs.std(axis=1, dtype=np.float64), 3).tolist()
         
         # Spectral centroid
-        centroid = librosa.feature.spectral_centroid(y=audio, sr=sr)
+        centroid = librosa.feature.spectral_centroid(y=audio, sr=sr, S=S)
         centroid_mean = float(np.mean(centroid))
         
         # Spectral rolloff
-        rolloff = librosa.feature.spectral_rolloff(y=audio, sr=sr)
+        rolloff = librosa.feature.spectral_rolloff(y=audio, sr=sr, S=S)
         rolloff_mean = float(np.mean(rolloff))
         
         # Spectral bandwidth
-        bandwidth = librosa.feature.spectral_bandwidth(y=audio, sr=sr)
+        bandwidth = librosa.feature.spectral_bandwidth(y=audio, sr=sr, S=S)
         bandwidth_mean = float(np.mean(bandwidth))
         
         return {
-            "mfcc_means": [round(m, 3) for m in mfcc_means],
-            "mfcc_stds": [round(s, 3) for s in mfcc_stds],
+            "mfcc_means": mfcc_means,
+            "mfcc_stds": mfcc_stds,
             "spectral_centroid_mean": round(centroid_mean, 2),
             "rolloff_mean": round(rolloff_mean, 2),
             "bandwidth_mean": round(bandwidth_mean, 2)
@@ -254,21 +379,22 @@ def extract_spectral(audio: np.ndarray, sr: int) -> Dict:
         }
 
 
-def extract_all_features(audio: np.ndarray, sr: int, segments: List[Dict] = None) -> Dict:
+def extract_all_features(audio: np.ndarray, sr: int, segments: Optional[np.ndarray] = None) -> Dict:
     """
     Extract all acoustic features from audio.
     
     Args:
         audio: Audio array
         sr: Sample rate
-        segments: Optional VAD segments (for speech-only analysis)
+        segments: Optional VAD segments from vad.segment_speech (for speech-only analysis)
         
     Returns:
         Dictionary containing all features
     """
     # Use speech-only audio if segments provided
+    audio = _as_float32(audio)
     analysis_audio = audio
-    if segments:
+    if segments is not None and len(segments):
         from vad import get_speech_only_audio
         speech_audio = get_speech_only_audio(audio, sr, segments)
         if len(speech_audio) > sr:  # At least 1 second of speech
@@ -277,14 +403,42 @@ def extract_all_features(audio: np.ndarray, sr: int, segments: List[Dict] = None
         else:
             logger.warning("Speech-only audio too short, using full audio")
     
-    prosody = extract_prosody(analysis_audio, sr)
-    loudness = extract_loudness(analysis_audio, sr)
-    quality = extract_voice_quality_librosa(analysis_audio, sr)
-    spectral = extract_spectral(analysis_audio, sr)
+    # One STFT shared by every spectrogram-based extractor
+    # (pitch tracking and time-domain RMS do their own framing)
+    S = compute_spectrogram(analysis_audio)
     
-    return {
-        "prosody": prosody,
-        "loudness": loudness,
-        "quality": quality,
-        "spectral": spectral
+    # The extractors are independent and spend most of their time in
+    # numpy/numba code that releases the GIL, so run them side by side
+    tasks = {
+        "prosody": (extract_prosody, (analysis_audio, sr), {}),
+        "loudness": (extract_loudness, (analysis_audio, sr), {}),
+        "quality": (extract_voice_quality_librosa, (analysis_audio, sr), {"S": S}),
+        "spectral": (extract_spectral, (analysis_audio, sr), {"S": S}),
+    }
+    futures = {
+        name: _feature_executor.submit(fn, *args, **kwargs)
+        for name, (fn, args, kwargs) in tasks.items()
     }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _warmup() -> None:
+    """
+    Run every extractor once on a short silent clip so librosa's numba
+    kernels compile at process start instead of on the first request.
+    """
+    try:
+        sr = 16000
+        audio = np.zeros(sr * 2, dtype=np.float32)
+        S = compute_spectrogram(audio)
+        extract_prosody(audio, sr)
+        extract_loudness(audio, sr)
+        extract_voice_quality_librosa(audio, sr, S=S)
+        extract_spectral(audio, sr, S=S)
+        logger.info("Feature extractor warm-up complete")
+    except Exception as e:
+        logger.warning(f"Feature extractor warm-up failed: {e}")
+
+
+if os.environ.get("FEATURE_WARMUP") == "1":
+    _warmup()
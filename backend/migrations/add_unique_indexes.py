@@ -1,5 +1,6 @@
 """
-Migration script to add unique indexes to prevent duplicate users and sessions.
+Migration script to add unique indexes to prevent duplicate users and sessions,
+plus the assessment lookup indexes.
 Run this once to set up the database constraints.
 
 Usage:
@@ -15,7 +16,7 @@ ROOT_DIR = Path(__file__).parent.parent
 load_dotenv(ROOT_DIR / '.env')
 
 async def create_unique_indexes():
-    """Create unique indexes on users and user_sessions collections."""
+    """Create unique indexes on users, user_sessions and assessment collections."""
     mongo_url = os.environ.get('MONGO_URL')
     db_name = os.environ.get('DB_NAME')
     
@@ -52,6 +53,21 @@ async def create_unique_indexes():
         await db.user_sessions.create_index("expires_at", expireAfterSeconds=0, name="ttl_expires_at")
         print("✓ TTL index on user_sessions.expires_at created")
         
+        # Create unique index on assessments.assessment_id
+        print("Creating unique index on assessments.assessment_id...")
+        await db.assessments.create_index("assessment_id", unique=True, name="unique_assessment_id")
+        print("✓ Unique index on assessments.assessment_id created")
+        
+        # Create compound index for per-user history and usage counts
+        print("Creating index on assessments.(user_id, created_at)...")
+        await db.assessments.create_index([("user_id", 1), ("created_at", -1)], name="idx_user_created_at")
+        print("✓ Index on assessments.(user_id, created_at) created")
+        
+        # Create index on training_questions.assessment_id for faster lookups
+        print("Creating index on training_questions.assessment_id...")
+        await db.training_questions.create_index("assessment_id", name="idx_assessment_id")
+        print("✓ Index on training_questions.assessment_id created")
+        
         print("\n✅ All indexes created successfully!")
         
     except Exception as e:
@@ -0,0 +1,43 @@
+"""
+Migration script to strip stored base64 audio from existing assessments.
+New assessments no longer keep the raw upload; this shrinks the old ones.
+
+Usage:
+    python backend/migrations/drop_assessment_audio.py
+"""
+import asyncio
+import os
+from motor.motor_asyncio import AsyncIOMotorClient
+from dotenv import load_dotenv
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+load_dotenv(ROOT_DIR / '.env')
+
+async def drop_assessment_audio():
+    """Unset audio_data on every assessment that still has it."""
+    mongo_url = os.environ.get('MONGO_URL')
+    db_name = os.environ.get('DB_NAME')
+
+    if not mongo_url or not db_name:
+        print("ERROR: MONGO_URL and DB_NAME environment variables must be set")
+        return
+
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[db_name]
+
+    try:
+        print("Removing audio_data from assessments...")
+        result = await db.assessments.update_many(
+            {"audio_data": {"$exists": True}},
+            {"$unset": {"audio_data": ""}}
+        )
+        print(f"✓ Removed audio_data from {result.modified_count} assessments")
+
+    except Exception as e:
+        print(f"\n❌ Error removing audio data: {e}")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(drop_assessment_audio())
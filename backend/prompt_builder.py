@@ -17,6 +17,9 @@ Your role:
 
 Tone: Supportive, specific, conversational, expert but approachable. Write like you're having a one-on-one coaching session."""
 
+# Shared across requests; the OpenAI SDK only reads message dicts
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
+
 
 def build_gpt_analysis_prompt(transcription: str, acoustic_metrics: Dict, duration: float) -> str:
     """
@@ -74,7 +77,8 @@ Provide warm, personalized feedback in JSON format with these exact fields:
   "overall_score": number (0-100, holistic assessment of their communication effectiveness),
   "clarity_score": number (0-100, how clear and understandable they are),
   "confidence_score": number (0-100, how confident they sound),
-  "actionable_tips": ["array of 3 immediate, practical tips they can try in their next conversation"]
+  "actionable_tips": ["array of 3 immediate, practical tips they can try in their next conversation"],
+  "training_questions": [{{"question": "string", "answer": "string"}}] (10 practice questions with answers that target their growth areas)
 }}
 
 **Important guidelines:**
@@ -207,6 +211,16 @@ def get_json_schema() -> Dict:
             "overall_score": {"type": "number"},
             "clarity_score": {"type": "number"},
             "confidence_score": {"type": "number"},
-            "actionable_tips": {"type": "array", "items": {"type": "string"}}
+            "actionable_tips": {"type": "array", "items": {"type": "string"}},
+            "training_questions": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "question": {"type": "string"},
+                        "answer": {"type": "string"}
+                    }
+                }
+            }
         }
     }
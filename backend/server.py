@@ -1,72 +1,148 @@
-from fastapi import FastAPI, APIRouter, File, UploadFile, Form, HTTPException, Request, Response
+from fastapi import FastAPI, APIRouter, BackgroundTasks, File, UploadFile, Form, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 import uvicorn
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
 import os
+import sys
+import importlib.util
 import tempfile
 import logging
 import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional, Dict, Any
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional, Dict, Any, Callable, Tuple
 import uuid
-from datetime import datetime
+import random
+import copy
+import hashlib
+from cachetools import TTLCache
+from collections import Counter
+from datetime import datetime, timezone
 import base64
 import re
-import json
-from openai import OpenAI
+import orjson
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from auth import AuthService
+from db_indexes import create_indexes
 from usage import UsageService
-import audio_utils
-import vad
-import feature_extractor
-import insights_generator
-import prompt_builder
+
+
+def _lazy_import(name: str):
+    """Import a module on first attribute access.
+
+    The audio pipeline pulls in librosa/numba/webrtcvad, which auth/usage-only
+    workers never need; deferring it keeps their startup time and RSS down.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+audio_utils = _lazy_import("audio_utils")
+vad = _lazy_import("vad")
+feature_extractor = _lazy_import("feature_extractor")
+insights_generator = _lazy_import("insights_generator")
+prompt_builder = _lazy_import("prompt_builder")
+acoustics = _lazy_import("acoustics")
+
+
+def _load_audio_pipeline() -> None:
+    """Force the lazy pipeline modules to load (and warm up, if FEATURE_WARMUP=1)."""
+    for module in (audio_utils, vad, feature_extractor, acoustics):
+        module.__name__
 
 # Rate limiting
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 
-# Configure logging early
-logging.basicConfig(
+# Configure logging early (audio worker processes get the same setup)
+configure_logging = partial(
+    logging.basicConfig,
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Request timeout in seconds
 REQUEST_TIMEOUT_SECONDS = 120
 
+# Request-level input caps, checked before any decoding. The base64 cap is
+# audio_utils.MAX_AUDIO_SIZE_MB (25MB) after 4/3 inflation; kept literal so
+# validation doesn't load the audio pipeline.
+MAX_AUDIO_BASE64_CHARS = 4 * ((25 * 1024 * 1024 + 2) // 3)
+MAX_RECORDING_TIME_SECONDS = 600
+
+# Transcripts shorter than this get rule-based insights only (no GPT call)
+MIN_GPT_WORD_COUNT = 20
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Worker threads for the CPU-bound audio stages (decode, VAD, features)
+AUDIO_WORKERS = int(os.environ.get("AUDIO_WORKERS", "2"))
+
+# Worker processes for the acoustic stage (VAD + features), which holds the GIL
+# for much of its run; 0 keeps it on the audio_executor threads
+AUDIO_PROCESSES = int(os.environ.get("AUDIO_PROCESSES", "0"))
+
+# Keep the analysed 16 kHz WAV in GridFS (off the assessment document); off by default
+STORE_AUDIO = os.environ.get("STORE_AUDIO") == "1"
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
 
-# OpenAI clients
-# For Whisper (audio transcription) - use direct OpenAI API
-openai_audio_client = OpenAI(
-    api_key=os.environ['OPENAI_API_KEY']
+# OpenAI client - one client (and connection pool) for Whisper and GPT-4,
+# both of which hit the same API host
+openai_client = AsyncOpenAI(
+    api_key=os.environ['OPENAI_API_KEY'],
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+    )
 )
 
-# For GPT-4 (text analysis) - use direct OpenAI API
-openai_text_client = OpenAI(
-    api_key=os.environ['OPENAI_API_KEY']
-)
+# Blocking audio work is handed off here so it never runs on the event loop
+audio_executor = ThreadPoolExecutor(max_workers=AUDIO_WORKERS, thread_name_prefix="audio")
+# spawn, not fork: the parent has live event-loop, Mongo and executor threads
+acoustics_executor = ProcessPoolExecutor(
+    max_workers=AUDIO_PROCESSES,
+    mp_context=multiprocessing.get_context("spawn"),
+    initializer=configure_logging
+) if AUDIO_PROCESSES > 0 else audio_executor
 
 # Initialize services
 auth_service = AuthService(db)
 usage_service = UsageService(db)
 
-# Initialize Rate Limiter
-limiter = Limiter(key_func=get_remote_address)
+def _rate_limit_key(request: Request) -> str:
+    """Key signed-in callers by user id (recently validated sessions only), everyone else by address."""
+    user_id = auth_service.cached_user_id(request)
+    return f"user:{user_id}" if user_id else get_remote_address(request)
+
+# Initialize Rate Limiter. Counters are per-process unless RATE_LIMIT_STORAGE_URI
+# points at shared storage (e.g. redis://host:6379, which needs the redis package)
+limiter = Limiter(
+    key_func=_rate_limit_key,
+    storage_uri=os.environ.get("RATE_LIMIT_STORAGE_URI", "memory://")
+)
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -76,18 +152,18 @@ api_router = APIRouter(prefix="/api")
 
 # Define Models
 class StatusCheck(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
     client_name: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class StatusCheckCreate(BaseModel):
     client_name: str
 
 class VoiceAnalysisRequest(BaseModel):
-    audio_base64: str
+    audio_base64: str = Field(..., max_length=MAX_AUDIO_BASE64_CHARS)
     user_id: str
     recording_mode: str
-    recording_time: int
+    recording_time: int = Field(..., le=MAX_RECORDING_TIME_SECONDS)
 
 class VoiceAnalysisResponse(BaseModel):
     assessment_id: str
@@ -124,8 +200,10 @@ class GPTInsightsResponse(BaseModel):
     clarity_score: int = 75
     confidence_score: int = 70
     actionable_tips: List[str] = []
+    training_questions: List[Dict[str, Any]] = []
     
-    @validator('overall_score', 'clarity_score', 'confidence_score', pre=True)
+    @field_validator('overall_score', 'clarity_score', 'confidence_score', mode='before')
+    @classmethod
     def clamp_scores(cls, v):
         """Ensure scores are within valid range"""
         if isinstance(v, (int, float)):
@@ -139,9 +217,8 @@ async def root():
 
 @api_router.post("/status", response_model=StatusCheck)
 async def create_status_check(input: StatusCheckCreate):
-    status_dict = input.dict()
-    status_obj = StatusCheck(**status_dict)
-    _ = await db.status_checks.insert_one(status_obj.dict())
+    status_obj = StatusCheck(**input.model_dump())
+    _ = await db.status_checks.insert_one(status_obj.model_dump())
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
@@ -183,6 +260,44 @@ async def get_usage(request: Request):
     return await usage_service.get_user_usage(user["id"])
 
 # ============ GUIDED SPEAKING TEXT ENDPOINTS ============
+GUIDED_TEXT_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "You are an expert at creating practice texts for voice assessment and communication training."
+}
+
+GUIDED_TEXT_PROMPT_TEMPLATE = """Generate a practice text for voice assessment. The text should be:
+- Appropriate for reading aloud in 30-90 seconds
+- Clear and well-structured
+- Suitable for {category} context
+- Between 50-150 words
+- Engaging and natural
+
+Return a JSON object with:
+{{
+  "title": "A descriptive title",
+  "category": "{category}",
+  "content": "The full text content to read"
+}}"""
+
+# Returned when GPT fails
+GUIDED_TEXT_FALLBACKS = {
+    "Professional": {
+        "title": "Professional Introduction",
+        "category": "Professional",
+        "content": "Hello, my name is Alex Johnson. I have over five years of experience in software development and project management. I specialize in building scalable web applications and leading cross-functional teams. I am passionate about using technology to solve real-world problems and deliver value to users."
+    },
+    "Business": {
+        "title": "Product Pitch",
+        "category": "Business",
+        "content": "Our innovative platform revolutionizes how businesses manage their customer relationships. With AI-powered insights and seamless integration capabilities, we help companies increase customer satisfaction by up to forty percent while reducing operational costs. Join over five thousand companies already transforming their customer experience."
+    },
+    "Creative": {
+        "title": "Storytelling",
+        "category": "Creative",
+        "content": "The sun was setting over the mountains, casting long shadows across the valley. Sarah stood at the edge of the cliff, her heart pounding with anticipation. This was the moment she had been waiting for, the culmination of months of preparation. With a deep breath, she took her first step forward into the unknown."
+    }
+}
+
 @api_router.post("/generate-guided-text", response_model=GuidedTextResponse)
 @limiter.limit("10/minute")
 async def generate_guided_text(request: Request, request_data: GuidedTextRequest):
@@ -195,33 +310,21 @@ async def generate_guided_text(request: Request, request_data: GuidedTextRequest
         
         # Categories for variety
         categories = ["Professional", "Business", "Creative", "Educational", "Motivational", "Technical"]
-        selected_category = request_data.category or categories[len(str(uuid.uuid4())) % len(categories)]
+        selected_category = request_data.category or random.choice(categories)
         
-        prompt = f"""Generate a practice text for voice assessment. The text should be:
-- Appropriate for reading aloud in 30-90 seconds
-- Clear and well-structured
-- Suitable for {selected_category} context
-- Between 50-150 words
-- Engaging and natural
-
-Return a JSON object with:
-{{
-  "title": "A descriptive title",
-  "category": "{selected_category}",
-  "content": "The full text content to read"
-}}"""
+        prompt = GUIDED_TEXT_PROMPT_TEMPLATE.format(category=selected_category)
 
         try:
-            response = openai_text_client.chat.completions.create(
+            response = await openai_client.chat.completions.create(
                 model="gpt-4-turbo",
                 messages=[
-                    {"role": "system", "content": "You are an expert at creating practice texts for voice assessment and communication training."},
+                    GUIDED_TEXT_SYSTEM_MESSAGE,
                     {"role": "user", "content": prompt}
                 ],
                 response_format={"type": "json_object"}
             )
             
-            result = json.loads(response.choices[0].message.content)
+            result = orjson.loads(response.choices[0].message.content)
             
             return GuidedTextResponse(
                 title=result.get("title", "Practice Text"),
@@ -232,25 +335,7 @@ Return a JSON object with:
         except Exception as e:
             logger.error(f"Error generating guided text: {str(e)}")
             # Return a fallback text
-            fallback_texts = {
-                "Professional": {
-                    "title": "Professional Introduction",
-                    "category": "Professional",
-                    "content": "Hello, my name is Alex Johnson. I have over five years of experience in software development and project management. I specialize in building scalable web applications and leading cross-functional teams. I am passionate about using technology to solve real-world problems and deliver value to users."
-                },
-                "Business": {
-                    "title": "Product Pitch",
-                    "category": "Business",
-                    "content": "Our innovative platform revolutionizes how businesses manage their customer relationships. With AI-powered insights and seamless integration capabilities, we help companies increase customer satisfaction by up to forty percent while reducing operational costs. Join over five thousand companies already transforming their customer experience."
-                },
-                "Creative": {
-                    "title": "Storytelling",
-                    "category": "Creative",
-                    "content": "The sun was setting over the mountains, casting long shadows across the valley. Sarah stood at the edge of the cliff, her heart pounding with anticipation. This was the moment she had been waiting for, the culmination of months of preparation. With a deep breath, she took her first step forward into the unknown."
-                }
-            }
-            
-            fallback = fallback_texts.get(selected_category, fallback_texts["Professional"])
+            fallback = GUIDED_TEXT_FALLBACKS.get(selected_category, GUIDED_TEXT_FALLBACKS["Professional"])
             return GuidedTextResponse(**fallback)
             
     except Exception as e:
@@ -258,112 +343,413 @@ Return a JSON object with:
         raise HTTPException(status_code=500, detail=f"Failed to generate guided text: {str(e)}")
 
 # ============ VOICE ANALYSIS ENDPOINTS ============
+# Recent (user_id, payload digest) -> assessment_id, to absorb accidental double-submits
+RECENT_SUBMISSION_TTL_SECONDS = 60
+_recent_submissions = TTLCache(maxsize=1024, ttl=RECENT_SUBMISSION_TTL_SECONDS)
+
+# Validated GPT analyses by prompt hash; see _analyze_with_gpt
+GPT_CACHE_TTL_SECONDS = 24 * 60 * 60
+_gpt_analysis_cache = TTLCache(maxsize=1024, ttl=GPT_CACHE_TTL_SECONDS)
+
+def _payload_digest(payload: bytes) -> str:
+    """Cheap fingerprint of an upload for duplicate detection."""
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
 @api_router.post("/analyze-voice", response_model=VoiceAnalysisResponse)
 @limiter.limit("5/minute")
-async def analyze_voice(request: Request, request_data: VoiceAnalysisRequest):
+async def analyze_voice(
+    request: Request,
+    request_data: VoiceAnalysisRequest,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    background: bool = False,
+):
     """
     Analyzes voice recording using OpenAI Whisper and GPT-4
+    
+    With ?background=true, returns 202 immediately and processes the
+    recording after the response; poll /assessment/{id} for results.
     """
     logger.info("========== ANALYZE-VOICE ENDPOINT CALLED ==========")
-    logger.info(f"Recording mode: {request_data.recording_mode}, Recording time: {request_data.recording_time}")
     logger.info(f"Audio base64 length: {len(request_data.audio_base64)} characters")
     
+    # Authenticate before spending any work on the payload
+    await auth_service.get_current_user(request)
+    
+    # Decode once, off the event loop; the bytes feed both the digest and the decoder
+    loop = asyncio.get_running_loop()
     try:
-        # Get authenticated user (required for usage tracking)
-        logger.info("Attempting to get authenticated user...")
-        user = await auth_service.get_current_user(request)
-        user_id = user["id"]
-        logger.info(f"Authenticated user: {user_id}")
+        audio_bytes = await loop.run_in_executor(
+            audio_executor, audio_utils.decode_base64_payload, request_data.audio_base64
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    payload_digest = await loop.run_in_executor(audio_executor, _payload_digest, audio_bytes)
+    
+    return await _run_voice_analysis(
+        request,
+        recording_mode=request_data.recording_mode,
+        recording_time=request_data.recording_time,
+        load_audio=lambda: audio_utils.load_audio_from_bytes(audio_bytes, target_sr=16000),
+        payload_digest=payload_digest,
+        response=response,
+        background_tasks=background_tasks if background else None,
+    )
+
+@api_router.post("/analyze-voice/upload", response_model=VoiceAnalysisResponse)
+@limiter.limit("5/minute")
+async def analyze_voice_upload(
+    request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    audio: UploadFile = File(...),
+    recording_mode: str = Form(...),
+    recording_time: int = Form(..., le=MAX_RECORDING_TIME_SECONDS),
+    background: bool = False,
+):
+    """
+    Analyzes a voice recording sent as multipart/form-data.
+    
+    Same pipeline as /analyze-voice, minus the base64 inflation and decode pass.
+    """
+    logger.info("========== ANALYZE-VOICE UPLOAD ENDPOINT CALLED ==========")
+    max_bytes = audio_utils.MAX_AUDIO_SIZE_MB * 1024 * 1024
+    audio_bytes = await audio.read(max_bytes + 1)
+    if len(audio_bytes) > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Audio file too large: exceeds {audio_utils.MAX_AUDIO_SIZE_MB}MB limit"
+        )
+    logger.info(f"Audio upload size: {len(audio_bytes)} bytes")
+    payload_digest = await asyncio.get_running_loop().run_in_executor(audio_executor, _payload_digest, audio_bytes)
+    
+    return await _run_voice_analysis(
+        request,
+        recording_mode=recording_mode,
+        recording_time=recording_time,
+        load_audio=lambda: audio_utils.load_audio_from_bytes(audio_bytes, target_sr=16000),
+        payload_digest=payload_digest,
+        response=response,
+        background_tasks=background_tasks if background else None,
+    )
+
+@api_router.post("/analyze-voice/stream")
+@limiter.limit("5/minute")
+async def analyze_voice_stream(request: Request, request_data: VoiceAnalysisRequest):
+    """
+    Analyzes a voice recording and reports progress as Server-Sent Events.
+    
+    Events: "accepted" (assessment_id), "transcription" (text, as soon as
+    Whisper returns and usually before the acoustic stage finishes), then
+    "completed" (transcription + analysis) or "error". A repeat submission
+    gets a single "duplicate" event. The analysis runs to completion and is
+    stored even if the client disconnects.
+    """
+    logger.info("========== ANALYZE-VOICE STREAM ENDPOINT CALLED ==========")
+    # Authenticate before spending any work on the payload
+    await auth_service.get_current_user(request)
+    loop = asyncio.get_running_loop()
+    try:
+        audio_bytes = await loop.run_in_executor(
+            audio_executor, audio_utils.decode_base64_payload, request_data.audio_base64
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    payload_digest = await loop.run_in_executor(audio_executor, _payload_digest, audio_bytes)
+    
+    # Auth and validation errors still come back as plain HTTP errors
+    user_id, assessment_id, submission_key, is_duplicate = await _create_assessment(
+        request, request_data.recording_mode, request_data.recording_time, payload_digest
+    )
+    if is_duplicate:
+        events = _single_event("duplicate", {"assessment_id": assessment_id})
+    else:
+        events = _stream_assessment(
+            assessment_id, user_id,
+            lambda: audio_utils.load_audio_from_bytes(audio_bytes, target_sr=16000),
+            submission_key
+        )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _sse_event(event: str, data: Dict[str, Any]) -> bytes:
+    """Encode one Server-Sent Event with a JSON payload."""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n\n"
+
+async def _single_event(event: str, data: Dict[str, Any]):
+    yield _sse_event(event, data)
+
+# Strong references to streamed analyses, so a client disconnect can't drop them mid-run
+_stream_tasks = set()
+
+async def _stream_assessment(
+    assessment_id: str,
+    user_id: str,
+    load_audio: Callable[[], Tuple[Any, int]],
+    submission_key: Tuple[str, str],
+):
+    """
+    Run _process_assessment as its own task and relay its progress as SSE.
+    """
+    progress: asyncio.Queue = asyncio.Queue()
+    report = lambda event, data: progress.put_nowait((event, data))
+    
+    async def run():
+        succeeded = False
+        try:
+            results = await _process_assessment(assessment_id, user_id, load_audio, report=report)
+            report("completed", {
+                "assessment_id": assessment_id,
+                "transcription": results["transcription"],
+                "analysis": results["analysis"]
+            })
+            succeeded = True
+        except HTTPException as e:
+            report("error", {"assessment_id": assessment_id, "detail": e.detail})
+        except Exception as e:
+            logger.exception("Unexpected error in analyze_voice_stream: %s", e)
+            report("error", {"assessment_id": assessment_id, "detail": f"Internal server error: {str(e)}"})
+        finally:
+            if not succeeded:
+                # Let the user retry a failed recording straight away
+                _recent_submissions.pop(submission_key, None)
+            # End of stream, even if the task is cancelled mid-run
+            progress.put_nowait(None)
+    
+    task = asyncio.ensure_future(run())
+    _stream_tasks.add(task)
+    task.add_done_callback(_stream_tasks.discard)
+    
+    yield _sse_event("accepted", {"assessment_id": assessment_id})
+    while (item := await progress.get()) is not None:
+        yield _sse_event(*item)
+
+async def _create_assessment(
+    request: Request,
+    recording_mode: str,
+    recording_time: int,
+    payload_digest: str,
+) -> Tuple[str, str, Tuple[str, str], bool]:
+    """
+    Authenticate, validate and insert the unprocessed assessment record.
+    
+    A repeat of the same payload within RECENT_SUBMISSION_TTL_SECONDS inserts
+    nothing and returns the earlier assessment_id instead.
+    
+    Returns:
+        Tuple of (user_id, assessment_id, submission_key, is_duplicate)
+    """
+    logger.info(f"Recording mode: {recording_mode}, Recording time: {recording_time}")
+    
+    # Get authenticated user (required for usage tracking)
+    logger.info("Attempting to get authenticated user...")
+    user = await auth_service.get_current_user(request)
+    user_id = user["id"]
+    logger.info(f"Authenticated user: {user_id}")
+    
+    if recording_time <= 0:
+        raise HTTPException(status_code=400, detail="Recording too short")
+    
+    submission_key = (user_id, payload_digest)
+    existing_id = _recent_submissions.get(submission_key)
+    if existing_id is not None:
+        logger.info(f"Duplicate submission for assessment {existing_id}, skipping analysis")
+        return user_id, existing_id, submission_key, True
+    
+    # Create assessment record
+    assessment_id = uuid.uuid4().hex
+    logger.info(f"Created assessment_id: {assessment_id}")
+    
+    # Save initial assessment to database
+    assessment = {
+        "assessment_id": assessment_id,
+        "user_id": user_id,
+        "recording_mode": recording_mode,
+        "recording_time": recording_time,
+        "processed": False,
+        "created_at": datetime.now(timezone.utc)
+    }
+    
+    logger.info("Inserting initial assessment into database...")
+    await db.assessments.insert_one(assessment)
+    logger.info("Initial assessment saved to database")
+    _recent_submissions[submission_key] = assessment_id
+    return user_id, assessment_id, submission_key, False
+
+async def _run_voice_analysis(
+    request: Request,
+    recording_mode: str,
+    recording_time: int,
+    load_audio: Callable[[], Tuple[Any, int]],
+    payload_digest: str,
+    response: Response,
+    background_tasks: Optional[BackgroundTasks] = None,
+) -> VoiceAnalysisResponse:
+    """
+    Shared acoustic + Whisper + GPT pipeline behind both analyze endpoints.
+    
+    load_audio decodes the request payload into (audio, sr). The raw audio
+    is never stored on the assessment. When background_tasks is given, the
+    pipeline runs after a 202 response.
+    
+    Invalid recording times are rejected, and a repeat of the same payload
+    within RECENT_SUBMISSION_TTL_SECONDS gets the earlier assessment_id,
+    before any Whisper/GPT work is done.
+    """
+    try:
+        user_id, assessment_id, submission_key, is_duplicate = await _create_assessment(
+            request, recording_mode, recording_time, payload_digest
+        )
+        if is_duplicate:
+            return VoiceAnalysisResponse(
+                assessment_id=assessment_id,
+                status="duplicate",
+                message="This recording was already submitted"
+            )
         
-        # Create assessment record
-        assessment_id = str(uuid.uuid4())
-        logger.info(f"Created assessment_id: {assessment_id}")
+        if background_tasks is not None:
+            # Respond now; the client polls /assessment/{id} until processed is True
+            background_tasks.add_task(
+                _process_assessment_in_background, assessment_id, user_id, load_audio, submission_key
+            )
+            response.status_code = 202
+            logger.info(f"Queued assessment {assessment_id} for background processing")
+            return VoiceAnalysisResponse(
+                assessment_id=assessment_id,
+                status="processing",
+                message="Analysis started"
+            )
         
-        # Save initial assessment to database
-        assessment = {
-            "assessment_id": assessment_id,
-            "user_id": user_id,
-            "recording_mode": request_data.recording_mode,
-            "recording_time": request_data.recording_time,
-            "audio_data": request_data.audio_base64,
-            "processed": False,
-            "created_at": datetime.utcnow()
+        try:
+            await _process_assessment(assessment_id, user_id, load_audio)
+        except Exception:
+            # Let the user retry a failed recording straight away
+            _recent_submissions.pop(submission_key, None)
+            raise
+        logger.info(f"Returning assessment_id: {assessment_id}")
+        return VoiceAnalysisResponse(
+            assessment_id=assessment_id,
+            status="completed",
+            message="Analysis completed successfully"
+        )
+        
+    except HTTPException:
+        # Re-raise HTTPExceptions (like 401, 403) as-is - don't convert to 500
+        raise
+    except Exception as e:
+        # Log unexpected errors with full traceback
+        logger.exception("Unexpected error in analyze_voice: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+async def _transcribe(
+    assessment_id: str,
+    wav_bytes: bytes,
+    report: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> str:
+    """
+    Transcribe in-memory WAV bytes with Whisper.
+    """
+    # 4. Transcription with Whisper
+    logger.info(f"Step 4: Transcribing audio with Whisper ({len(wav_bytes)} bytes)...")
+    transcription_response = await openai_client.audio.transcriptions.create(
+        model="whisper-1",
+        file=(f"{assessment_id}.wav", wav_bytes, "audio/wav"),
+        response_format="text"
+    )
+    transcription = transcription_response if isinstance(transcription_response, str) else transcription_response.text
+    logger.info(f"Transcription received: {len(transcription)} characters")
+    logger.info(f"Transcription preview: {transcription[:200]}..." if len(transcription) > 200 else f"Transcription: {transcription}")
+    if report is not None:
+        report("transcription", {"text": transcription})
+    return transcription
+
+async def _archive_audio(assessment_id: str, wav_bytes: bytes) -> bool:
+    """
+    Store the analysed WAV in GridFS under the assessment_id.
+    
+    Archiving is best-effort: a failure is logged and the analysis goes on.
+    """
+    try:
+        # Built per call: Motor binds GridFS buckets to the running event loop
+        audio_bucket = AsyncIOMotorGridFSBucket(db, bucket_name="assessment_audio")
+        await audio_bucket.upload_from_stream_with_id(
+            assessment_id, f"{assessment_id}.wav", wav_bytes,
+            metadata={"content_type": "audio/wav"}
+        )
+        return True
+    except Exception as e:
+        logger.error(f"Failed to archive audio for assessment {assessment_id}: {e}")
+        return False
+
+async def _process_assessment(
+    assessment_id: str,
+    user_id: str,
+    load_audio: Callable[[], Tuple[Any, int]],
+    report: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Run the analysis pipeline for an inserted assessment and store the results.
+    
+    report, if given, is called with intermediate ("transcription", {...})
+    events. Returns the stored results; failures are recorded on the
+    assessment document and re-raised as HTTPException.
+    """
+    try:
+        # ===== ACOUSTIC ANALYSIS PIPELINE =====
+        # CPU-bound stages run on audio_executor so the event loop keeps serving requests
+        loop = asyncio.get_running_loop()
+        
+        # 1. Decode the uploaded audio
+        logger.info("Step 1: Loading audio...")
+        audio, sr = await loop.run_in_executor(audio_executor, load_audio)
+        duration = audio_utils.get_audio_duration(audio, sr)
+        logger.info(f"Audio loaded: duration={duration:.2f}s, sample_rate={sr}")
+        
+        # 2-4. VAD/acoustic features on the executor while Whisper transcribes;
+        # neither depends on the other, so the wait is max() rather than sum()
+        wav_bytes = await loop.run_in_executor(audio_executor, audio_utils.encode_wav, audio, sr)
+        archive_task = asyncio.ensure_future(_archive_audio(assessment_id, wav_bytes)) if STORE_AUDIO else None
+        (segments, timing_metrics, acoustic_features), transcription = await asyncio.gather(
+            loop.run_in_executor(acoustics_executor, acoustics.analyze_acoustics, audio, sr, duration),
+            _transcribe(assessment_id, wav_bytes, report)
+        )
+        
+        # 5. Detect filler words
+        logger.info("Step 5: Detecting filler words...")
+        filler_words = detect_filler_words(transcription)
+        word_count = len(transcription.split())
+        speaking_pace = int((word_count / duration) * 60) if duration > 0 else 0
+        logger.info(f"Filler words: {filler_words}, Word count: {word_count}, Speaking pace: {speaking_pace} WPM")
+        
+        # 6. Build comprehensive metrics
+        logger.info("Step 6: Building comprehensive metrics...")
+        all_metrics = {
+            "transcription": transcription,
+            "duration": duration,
+            "word_count": word_count,
+            "speaking_pace": speaking_pace,
+            "filler_words": filler_words,
+            "timing": timing_metrics,
+            "prosody": acoustic_features["prosody"],
+            "loudness": acoustic_features["loudness"],
+            "quality": acoustic_features["quality"],
+            "spectral": acoustic_features["spectral"]
         }
         
-        logger.info("Inserting initial assessment into database...")
-        await db.assessments.insert_one(assessment)
-        logger.info("Initial assessment saved to database")
+        # 7. Generate rule-based personalized insights
+        logger.info("Step 7: Generating rule-based insights...")
+        rule_based_insights = insights_generator.generate_personalized_summary(all_metrics)
+        logger.info(f"Rule-based insights generated: voice_personality={rule_based_insights.get('voice_personality')}")
         
-        # Process audio
-        try:
-            # ===== ACOUSTIC ANALYSIS PIPELINE =====
-            # 1. Load audio from base64
-            logger.info("Step 1: Loading audio from base64...")
-            audio, sr = audio_utils.load_audio_from_base64(request_data.audio_base64, target_sr=16000)
-            duration = audio_utils.get_audio_duration(audio, sr)
-            logger.info(f"Audio loaded: duration={duration:.2f}s, sample_rate={sr}")
-            
-            # 2. Voice Activity Detection and timing analysis
-            logger.info("Step 2: Running Voice Activity Detection...")
-            segments = vad.segment_speech(audio, sr)
-            logger.info(f"VAD found {len(segments)} speech segments")
-            timing_metrics = vad.compute_timing_metrics(segments, duration)
-            logger.info(f"Timing metrics computed: {timing_metrics}")
-            
-            # 3. Extract all acoustic features
-            logger.info("Step 3: Extracting acoustic features...")
-            acoustic_features = feature_extractor.extract_all_features(audio, sr, segments)
-            logger.info(f"Acoustic features extracted: prosody keys={list(acoustic_features.get('prosody', {}).keys())}")
-            
-            # 4. Transcription with Whisper
-            logger.info("Step 4: Transcribing audio with Whisper...")
-            temp_wav_path = audio_utils.save_temp_wav(audio, sr)
-            logger.info(f"Temp WAV saved to: {temp_wav_path}")
-            try:
-                with open(temp_wav_path, "rb") as audio_file:
-                    logger.info("Calling OpenAI Whisper API...")
-                    transcription_response = openai_audio_client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio_file,
-                        response_format="text"
-                    )
-                    transcription = transcription_response if isinstance(transcription_response, str) else transcription_response.text
-                    logger.info(f"Transcription received: {len(transcription)} characters")
-                    logger.info(f"Transcription preview: {transcription[:200]}..." if len(transcription) > 200 else f"Transcription: {transcription}")
-            finally:
-                # Clean up temp file
-                if os.path.exists(temp_wav_path):
-                    os.remove(temp_wav_path)
-                    logger.info("Temp WAV file cleaned up")
-            
-            # 5. Detect filler words
-            logger.info("Step 5: Detecting filler words...")
-            filler_words = detect_filler_words(transcription)
-            word_count = len(transcription.split())
-            speaking_pace = int((word_count / duration) * 60) if duration > 0 else 0
-            logger.info(f"Filler words: {filler_words}, Word count: {word_count}, Speaking pace: {speaking_pace} WPM")
-            
-            # 6. Build comprehensive metrics
-            logger.info("Step 6: Building comprehensive metrics...")
-            all_metrics = {
-                "transcription": transcription,
-                "duration": duration,
-                "word_count": word_count,
-                "speaking_pace": speaking_pace,
-                "filler_words": filler_words,
-                "timing": timing_metrics,
-                "prosody": acoustic_features["prosody"],
-                "loudness": acoustic_features["loudness"],
-                "quality": acoustic_features["quality"],
-                "spectral": acoustic_features["spectral"]
-            }
-            
-            # 7. Generate rule-based personalized insights
-            logger.info("Step 7: Generating rule-based insights...")
-            rule_based_insights = insights_generator.generate_personalized_summary(all_metrics)
-            logger.info(f"Rule-based insights generated: voice_personality={rule_based_insights.get('voice_personality')}")
-            
-            # 8. Enhanced GPT analysis with acoustic context
+        # 8. Enhanced GPT analysis with acoustic context
+        if word_count < MIN_GPT_WORD_COUNT:
+            # Too little speech for GPT to add anything; rule-based insights cover it
+            logger.info(f"Steps 8-9: Skipping GPT for {word_count}-word transcript")
+            gpt_insights = {}
+        else:
             logger.info("Step 8: Building GPT analysis prompt...")
             gpt_prompt = prompt_builder.build_gpt_analysis_prompt(
                 transcription=transcription,
@@ -373,176 +759,212 @@ async def analyze_voice(request: Request, request_data: VoiceAnalysisRequest):
             logger.info(f"GPT prompt built: {len(gpt_prompt)} characters")
             
             logger.info("Step 9: Calling GPT-4 for analysis...")
-            try:
-                gpt_response = openai_text_client.chat.completions.create(
-                    model="gpt-4-turbo",
-                    messages=[
-                        {"role": "system", "content": prompt_builder.SYSTEM_PROMPT},
-                        {"role": "user", "content": gpt_prompt}
-                    ],
-                    response_format={"type": "json_object"},
-                    timeout=60  # 60 second timeout for GPT
-                )
-                logger.info("GPT response received, parsing JSON...")
-                raw_gpt_response = json.loads(gpt_response.choices[0].message.content)
-                logger.info(f"GPT raw response keys: {list(raw_gpt_response.keys())}")
-                # Validate and normalize GPT response using Pydantic model
-                validated_response = GPTInsightsResponse(**raw_gpt_response)
-                gpt_insights = validated_response.dict()
-                logger.info("GPT analysis completed and validated successfully")
-            except json.JSONDecodeError as e:
-                logger.error(f"GPT returned invalid JSON: {e}. Using rule-based insights.")
-                gpt_insights = {}
-            except Exception as e:
-                logger.error(f"GPT analysis failed: {e}. Using rule-based insights.")
-                gpt_insights = {}
-            
-            # 9. Merge insights: GPT + rule-based fallbacks
-            logger.info("Step 10: Merging GPT and rule-based insights...")
-            analysis = {
-                # User-facing insights (personalized narrative)
-                "insights": {
-                    "voice_personality": gpt_insights.get("voice_personality", rule_based_insights["voice_personality"]),
-                    "headline": gpt_insights.get("headline", rule_based_insights["headline"]),
-                    "key_insights": gpt_insights.get("key_insights", rule_based_insights["key_insights"]),
-                    "what_went_well": gpt_insights.get("strengths", rule_based_insights["what_went_well"]),
-                    "growth_opportunities": gpt_insights.get("improvements", rule_based_insights["growth_opportunities"]),
-                    "tone_description": gpt_insights.get("tone_description", rule_based_insights["tone_description"]),
-                    "voice_archetype": gpt_insights.get("archetype", rule_based_insights["voice_personality"]),
-                    "overall_score": gpt_insights.get("overall_score", 75),
-                    "clarity_score": gpt_insights.get("clarity_score", 75),
-                    "confidence_score": gpt_insights.get("confidence_score", 70),
-                    "personalized_tips": gpt_insights.get("actionable_tips", [])
-                },
-                
-                # Simplified metrics for UI display
-                "metrics": {
-                    "speaking_pace": speaking_pace,
-                    "word_count": word_count,
-                    "pause_effectiveness": timing_metrics["pause_count"],
-                    "vocal_variety": "High" if acoustic_features["prosody"]["pitch_std"] > 40 else "Moderate",
-                    "energy_level": "Dynamic" if acoustic_features["loudness"]["dynamic_range_db"] > 10 else "Consistent",
-                    "clarity_rating": "Excellent" if acoustic_features["quality"]["hnr_mean"] > 15 else "Good"
-                },
-                
-                # Raw technical data (for debugging/advanced view)
-                "technical": {
-                    "prosody": acoustic_features["prosody"],
-                    "loudness": acoustic_features["loudness"],
-                    "quality": acoustic_features["quality"],
-                    "spectral": acoustic_features["spectral"],
-                    "timing": timing_metrics,
-                    "filler_words": filler_words
-                },
-                
-                # Timelines for visualization
-                "timelines": {
-                    "pitch": acoustic_features["prosody"].get("pitch_series", []),
-                    "loudness": acoustic_features["loudness"].get("rms_series", []),
-                    "pauses": timing_metrics.get("pause_events", [])
-                },
-                
-                # Legacy fields for backward compatibility
-                "archetype": gpt_insights.get("archetype", rule_based_insights["voice_personality"]),
+            gpt_insights = await _analyze_with_gpt(gpt_prompt)
+        
+        # 9. Merge insights: GPT + rule-based fallbacks
+        logger.info("Step 10: Merging GPT and rule-based insights...")
+        analysis = {
+            # User-facing insights (personalized narrative)
+            "insights": {
+                "voice_personality": gpt_insights.get("voice_personality", rule_based_insights["voice_personality"]),
+                "headline": gpt_insights.get("headline", rule_based_insights["headline"]),
+                "key_insights": gpt_insights.get("key_insights", rule_based_insights["key_insights"]),
+                "what_went_well": gpt_insights.get("strengths", rule_based_insights["what_went_well"]),
+                "growth_opportunities": gpt_insights.get("improvements", rule_based_insights["growth_opportunities"]),
+                "tone_description": gpt_insights.get("tone_description", rule_based_insights["tone_description"]),
+                "voice_archetype": gpt_insights.get("archetype", rule_based_insights["voice_personality"]),
                 "overall_score": gpt_insights.get("overall_score", 75),
                 "clarity_score": gpt_insights.get("clarity_score", 75),
                 "confidence_score": gpt_insights.get("confidence_score", 70),
-                "tone": gpt_insights.get("tone_description", rule_based_insights["tone_description"]),
-                # Removed: "strengths" and "improvements" - duplicates of insights.what_went_well and insights.growth_opportunities
-                # Frontend already uses insights.what_went_well and insights.growth_opportunities as primary source
+                "personalized_tips": gpt_insights.get("actionable_tips", [])
+            },
+            
+            # Simplified metrics for UI display
+            "metrics": {
                 "speaking_pace": speaking_pace,
-                "filler_words": filler_words,
-                "filler_count": sum(filler_words.values()),
                 "word_count": word_count,
-                
-                # Pitch analysis fields for frontend
-                "pitch_avg": round(acoustic_features["prosody"].get("pitch_mean", 0)),
-                "pitch_range": _get_pitch_range_label(acoustic_features["prosody"].get("pitch_range_hz", 0))
-            }
-            
-            logger.info("Step 11: Analysis object built successfully")
-            logger.info(f"Analysis keys: {list(analysis.keys())}")
-            logger.info(f"Overall score: {analysis.get('overall_score')}, Clarity: {analysis.get('clarity_score')}, Confidence: {analysis.get('confidence_score')}")
-            logger.info(f"Pitch data: pitch_avg={analysis.get('pitch_avg')} Hz, pitch_range={analysis.get('pitch_range')}")
-            
-            # Update assessment with results
-            logger.info("Step 12: Updating assessment in database...")
-            await db.assessments.update_one(
-                {"assessment_id": assessment_id},
-                {"$set": {
-                    "transcription": transcription,
-                    "analysis": analysis,
-                    "processed": True,
-                    "processed_at": datetime.utcnow()
-                }}
-            )
-            logger.info("Assessment updated in database")
-            
-            # Generate training questions (with error handling - don't fail main request)
-            logger.info("Step 13: Generating training questions...")
-            try:
-                training_questions = generate_training_questions(analysis, transcription)
-                logger.info(f"Generated {len(training_questions)} training questions")
-                await db.training_questions.insert_one({
-                    "assessment_id": assessment_id,
-                    "questions": training_questions,
-                    "created_at": datetime.utcnow()
-                })
-                logger.info("Training questions saved to database")
-            except Exception as tq_error:
-                logger.error(f"Failed to generate training questions: {tq_error}")
-                # Don't fail the main request - training questions are non-critical
+                "pause_effectiveness": timing_metrics["pause_count"],
+                "vocal_variety": "High" if acoustic_features["prosody"]["pitch_std"] > 40 else "Moderate",
+                "energy_level": "Dynamic" if acoustic_features["loudness"]["dynamic_range_db"] > 10 else "Consistent",
+                "clarity_rating": "Excellent" if acoustic_features["quality"]["hnr_mean"] > 15 else "Good"
+            },
             
-            # Track usage for this analysis
-            logger.info("Step 14: Tracking usage...")
-            try:
-                await usage_service.track_analysis(user_id)
-                logger.info(f"Usage tracked for user {user_id}")
-            except Exception as usage_error:
-                logger.error(f"Failed to track usage: {usage_error}")
-                # Don't fail the request for usage tracking failures
+            # Raw technical data (for debugging/advanced view)
+            "technical": {
+                "prosody": acoustic_features["prosody"],
+                "loudness": acoustic_features["loudness"],
+                "quality": acoustic_features["quality"],
+                "spectral": acoustic_features["spectral"],
+                "timing": timing_metrics,
+                "filler_words": filler_words
+            },
             
-            logger.info("========== ANALYZE-VOICE COMPLETED SUCCESSFULLY ==========")
-            logger.info(f"Returning assessment_id: {assessment_id}")
-            return VoiceAnalysisResponse(
-                assessment_id=assessment_id,
-                status="completed",
-                message="Analysis completed successfully"
-            )
+            # Timelines for visualization
+            "timelines": {
+                "pitch": acoustic_features["prosody"].get("pitch_series", {"time": [], "f0": []}),
+                "loudness": acoustic_features["loudness"].get("rms_series", {"time": [], "rms": []}),
+                "pauses": timing_metrics.get("pause_events", [])
+            },
             
-        except asyncio.TimeoutError:
-            logger.error(f"Request timed out after {REQUEST_TIMEOUT_SECONDS}s for assessment {assessment_id}")
-            await db.assessments.update_one(
-                {"assessment_id": assessment_id},
-                {"$set": {
-                    "processed": True,
-                    "error": "Request timed out",
-                    "processed_at": datetime.utcnow()
-                }}
-            )
-            raise HTTPException(status_code=504, detail="Request timed out. Please try a shorter recording.")
+            # Legacy fields for backward compatibility
+            "archetype": gpt_insights.get("archetype", rule_based_insights["voice_personality"]),
+            "overall_score": gpt_insights.get("overall_score", 75),
+            "clarity_score": gpt_insights.get("clarity_score", 75),
+            "confidence_score": gpt_insights.get("confidence_score", 70),
+            "tone": gpt_insights.get("tone_description", rule_based_insights["tone_description"]),
+            # Removed: "strengths" and "improvements" - duplicates of insights.what_went_well and insights.growth_opportunities
+            # Frontend already uses insights.what_went_well and insights.growth_opportunities as primary source
+            "speaking_pace": speaking_pace,
+            "filler_words": filler_words,
+            "filler_count": sum(filler_words.values()),
+            "word_count": word_count,
             
-        except Exception as e:
-            import traceback
-            logger.error(f"Error processing audio: {str(e)}\n{traceback.format_exc()}")
-            await db.assessments.update_one(
+            # Pitch analysis fields for frontend
+            "pitch_avg": round(acoustic_features["prosody"].get("pitch_mean", 0)),
+            "pitch_range": _get_pitch_range_label(acoustic_features["prosody"].get("pitch_range_hz", 0))
+        }
+        
+        logger.info("Step 11: Analysis object built successfully")
+        logger.info(f"Analysis keys: {list(analysis.keys())}")
+        logger.info(f"Overall score: {analysis.get('overall_score')}, Clarity: {analysis.get('clarity_score')}, Confidence: {analysis.get('confidence_score')}")
+        logger.info(f"Pitch data: pitch_avg={analysis.get('pitch_avg')} Hz, pitch_range={analysis.get('pitch_range')}")
+        
+        # Update assessment with results
+        logger.info("Step 12: Updating assessment in database...")
+        processed_at = datetime.now(timezone.utc)
+        results = {
+            "transcription": transcription,
+            "analysis": analysis,
+            "processed": True,
+            "processed_at": processed_at
+        }
+        if archive_task is not None and await archive_task:
+            results["audio_id"] = assessment_id
+        # Results and training questions go out together; only the former can fail the request
+        logger.info("Step 13: Saving training questions...")
+        await asyncio.gather(
+            db.assessments.update_one(
                 {"assessment_id": assessment_id},
-                {"$set": {
-                    "processed": True,
-                    "error": str(e),
-                    "processed_at": datetime.utcnow()
-                }}
-            )
-            raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
-            
-    except HTTPException:
-        # Re-raise HTTPExceptions (like 401, 403) as-is - don't convert to 500
-        raise
+                {"$set": results}
+            ),
+            _save_training_questions(assessment_id, gpt_insights.get("training_questions"), processed_at)
+        )
+        logger.info("Assessment updated in database")
+        
+        # Track usage for this analysis
+        logger.info("Step 14: Tracking usage...")
+        try:
+            await usage_service.track_analysis(user_id)
+            logger.info(f"Usage tracked for user {user_id}")
+        except Exception as usage_error:
+            logger.error(f"Failed to track usage: {usage_error}")
+            # Don't fail the request for usage tracking failures
+        
+        logger.info("========== ANALYZE-VOICE COMPLETED SUCCESSFULLY ==========")
+        return results
+        
+    except asyncio.TimeoutError:
+        logger.error(f"Request timed out after {REQUEST_TIMEOUT_SECONDS}s for assessment {assessment_id}")
+        await db.assessments.update_one(
+            {"assessment_id": assessment_id},
+            {"$set": {
+                "processed": True,
+                "error": "Request timed out",
+                "processed_at": datetime.now(timezone.utc)
+            }}
+        )
+        raise HTTPException(status_code=504, detail="Request timed out. Please try a shorter recording.")
+        
     except Exception as e:
-        # Log unexpected errors with full traceback
-        import traceback
-        logger.error(f"Unexpected error in analyze_voice: {str(e)}\n{traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+        logger.exception("Error processing audio: %s", e)
+        await db.assessments.update_one(
+            {"assessment_id": assessment_id},
+            {"$set": {
+                "processed": True,
+                "error": str(e),
+                "processed_at": datetime.now(timezone.utc)
+            }}
+        )
+        raise HTTPException(status_code=500, detail=f"Error processing audio: {str(e)}")
+
+async def _save_training_questions(assessment_id: str, questions: Optional[List[Dict[str, Any]]], created_at: datetime) -> None:
+    """Store the assessment's training questions. Best-effort: failures are logged, not raised."""
+    try:
+        training_questions = build_training_questions(questions)
+        logger.info(f"Built {len(training_questions)} training questions")
+        await db.training_questions.insert_one({
+            "assessment_id": assessment_id,
+            "questions": training_questions,
+            "created_at": created_at
+        })
+        logger.info("Training questions saved to database")
+    except Exception as tq_error:
+        logger.error(f"Failed to save training questions: {tq_error}")
+        # Don't fail the main request - training questions are non-critical
+
+
+async def _analyze_with_gpt(gpt_prompt: str) -> Dict[str, Any]:
+    """
+    Run the GPT-4 analysis for a prompt, memoized by the prompt's SHA-256.
+    
+    The prompt already folds in the transcript and every metric GPT sees,
+    so a repeat recording (retries, testing) skips the OpenAI call entirely.
+    Returns {} on failure so callers fall back to rule-based insights.
+    """
+    cache_key = hashlib.sha256(gpt_prompt.encode()).hexdigest()
+    cached = _gpt_analysis_cache.get(cache_key)
+    if cached is not None:
+        logger.info("GPT analysis served from cache")
+        return copy.deepcopy(cached)
+    
+    try:
+        gpt_response = await openai_client.chat.completions.create(
+            model="gpt-4-turbo",
+            messages=[
+                prompt_builder.SYSTEM_MESSAGE,
+                {"role": "user", "content": gpt_prompt}
+            ],
+            response_format={"type": "json_object"},
+            timeout=60  # 60 second timeout for GPT
+        )
+        logger.info("GPT response received, parsing JSON...")
+        raw_gpt_response = orjson.loads(gpt_response.choices[0].message.content)
+        logger.info(f"GPT raw response keys: {list(raw_gpt_response.keys())}")
+        # Validate and normalize GPT response using Pydantic model
+        validated_response = GPTInsightsResponse(**raw_gpt_response)
+        gpt_insights = validated_response.model_dump()
+        logger.info("GPT analysis completed and validated successfully")
+    except orjson.JSONDecodeError as e:
+        logger.error(f"GPT returned invalid JSON: {e}. Using rule-based insights.")
+        return {}
+    except Exception as e:
+        logger.error(f"GPT analysis failed: {e}. Using rule-based insights.")
+        return {}
+    
+    # Only successful, validated analyses are cached
+    _gpt_analysis_cache[cache_key] = copy.deepcopy(gpt_insights)
+    return gpt_insights
+
+async def _process_assessment_in_background(
+    assessment_id: str,
+    user_id: str,
+    load_audio: Callable[[], Tuple[Any, int]],
+    submission_key: Tuple[str, str],
+) -> None:
+    """
+    BackgroundTasks entry point for _process_assessment.
+    
+    The response has already been sent, so errors are only logged and left
+    on the assessment document for the polling client to pick up.
+    """
+    try:
+        await _process_assessment(assessment_id, user_id, load_audio)
+    except HTTPException as e:
+        _recent_submissions.pop(submission_key, None)
+        logger.warning(f"Background analysis failed for assessment {assessment_id}: {e.detail}")
+    except Exception as e:
+        _recent_submissions.pop(submission_key, None)
+        logger.exception("Unexpected error in background analysis for assessment %s: %s", assessment_id, e)
 
 @api_router.get("/assessment/{assessment_id}")
 @limiter.limit("30/minute")
@@ -553,47 +975,57 @@ async def get_assessment(request: Request, assessment_id: str):
     # Verify user owns this assessment
     user = await auth_service.get_current_user(request)
     
-    assessment = await db.assessments.find_one({
-        "assessment_id": assessment_id,
-        "user_id": user["id"]
-    })
+    # The two lookups are independent, so overlap their round trips;
+    # training questions are only returned once ownership is confirmed
+    assessment, training_questions = await asyncio.gather(
+        db.assessments.find_one(
+            {"assessment_id": assessment_id, "user_id": user["id"]},
+            {"audio_data": 0}  # Older assessments still carry the raw upload
+        ),
+        db.training_questions.find_one({"assessment_id": assessment_id})
+    )
     
     if not assessment:
         raise HTTPException(status_code=404, detail="Assessment not found")
     
-    # Get training questions
-    training_questions = await db.training_questions.find_one({"assessment_id": assessment_id})
-    
     # Remove MongoDB _id field
     assessment.pop("_id", None)
     if training_questions:
         training_questions.pop("_id", None)
         assessment["training_questions"] = training_questions.get("questions", [])
     
-    return assessment
+    # Hand the document straight to orjson; jsonable_encoder would walk every
+    # float in pitch_series/rms_series in Python first
+    return ORJSONResponse(assessment)
 
 @api_router.get("/assessments")
 @limiter.limit("20/minute")
-async def get_assessments(request: Request, limit: int = 10, skip: int = 0):
+async def get_assessments(request: Request, limit: int = Query(10, ge=1, le=100), skip: int = Query(0, ge=0)):
     """
     Get user's assessment history
     """
     user = await auth_service.get_current_user(request)
     
-    # Get assessments with pagination
-    assessments = await db.assessments.find(
-        {"user_id": user["id"]},
-        {"audio_data": 0}  # Exclude large audio data
-    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-    
-    # Remove MongoDB _id field
-    for assessment in assessments:
-        assessment.pop("_id", None)
+    # Page and total in one round trip, both off the (user_id, created_at) index
+    pipeline = [
+        {"$match": {"user_id": user["id"]}},
+        {"$sort": {"created_at": -1}},
+        {"$facet": {
+            "assessments": [
+                {"$skip": skip},
+                {"$limit": limit},
+                # Drop MongoDB _id; older assessments still carry the raw upload
+                {"$project": {"_id": 0, "audio_data": 0}}
+            ],
+            "total": [{"$count": "n"}]
+        }}
+    ]
+    result = (await db.assessments.aggregate(pipeline).to_list(1))[0]
     
-    return {
-        "assessments": assessments,
-        "total": await db.assessments.count_documents({"user_id": user["id"]})
-    }
+    return ORJSONResponse({
+        "assessments": result["assessments"],
+        "total": result["total"][0]["n"] if result["total"] else 0
+    })
 
 def _get_pitch_range_label(pitch_range_hz: float) -> str:
     """
@@ -612,118 +1044,99 @@ def _get_pitch_range_label(pitch_range_hz: float) -> str:
     else:
         return "Wide"
 
+# Filler word -> pattern; order here is the order results are reported in
+FILLER_PATTERNS = {
+    "um": r'um+',
+    "uh": r'uh+',
+    "ah": r'ah+',
+    "er": r'er+',
+    "like": r'like',
+    "you know": r'you know',
+    "I mean": r'i mean',
+    "so": r'so',
+    "right": r'right',
+    "okay": r'okay',
+    "actually": r'actually',
+    "basically": r'basically',
+    "literally": r'literally',
+    "honestly": r'honestly',
+    "kind of": r'kind of',
+    "sort of": r'sort of',
+}
+
+# One alternation with a capture group per filler, so a single scan
+# finds every filler and match.lastindex says which one it was
+_FILLER_RE = re.compile(
+    r'\b(?:' + '|'.join(f'({pattern})' for pattern in FILLER_PATTERNS.values()) + r')\b',
+    re.IGNORECASE
+)
+_FILLER_NAMES = list(FILLER_PATTERNS)
+
+@lru_cache(maxsize=256)
+def _filler_counts(text: str) -> Tuple[Tuple[str, int], ...]:
+    """Memoized (filler, count) pairs; retried recordings re-send the same transcript"""
+    counts = Counter(_FILLER_NAMES[m.lastindex - 1] for m in _FILLER_RE.finditer(text))
+    return tuple((filler, counts[filler]) for filler in _FILLER_NAMES if counts[filler])
+
 def detect_filler_words(text: str) -> Dict[str, int]:
     """
     Detect filler words in transcription.
     Expanded patterns for comprehensive detection.
     """
-    filler_patterns = {
-        "um": r'\bum+\b',
-        "uh": r'\buh+\b',
-        "ah": r'\bah+\b',
-        "er": r'\ber+\b',
-        "like": r'\blike\b',
-        "you know": r'\byou know\b',
-        "I mean": r'\bi mean\b',
-        "so": r'\bso\b',
-        "right": r'\bright\b',
-        "okay": r'\bokay\b',
-        "actually": r'\bactually\b',
-        "basically": r'\bbasically\b',
-        "literally": r'\bliterally\b',
-        "honestly": r'\bhonestly\b',
-        "kind of": r'\bkind of\b',
-        "sort of": r'\bsort of\b',
+    # Fresh dict per call, so callers can't mutate the cached counts
+    return dict(_filler_counts(text))
+
+DEFAULT_TRAINING_QUESTIONS = [
+    {
+        "question": "How can I reduce filler words in my speech?",
+        "answer": "Practice pausing instead of using filler words. Record yourself and identify patterns.",
+        "is_free": True
+    },
+    {
+        "question": "What exercises improve speaking clarity?",
+        "answer": "Try tongue twisters, slow reading aloud, and articulation exercises daily.",
+        "is_free": True
+    },
+    {
+        "question": "How do I project more confidence?",
+        "answer": "Maintain good posture, make eye contact, and practice power poses before speaking.",
+        "is_free": True
     }
-    
-    text_lower = text.lower()
-    filler_counts = {}
-    
-    for filler, pattern in filler_patterns.items():
-        count = len(re.findall(pattern, text_lower))
-        if count > 0:
-            filler_counts[filler] = count
-    
-    return filler_counts
+]
 
-def generate_training_questions(analysis: Dict[str, Any], transcription: str) -> List[Dict[str, Any]]:
+def build_training_questions(questions: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
     """
-    Generate personalized training questions using GPT-4
+    Normalize the training questions returned alongside the GPT-4 analysis.
+    
+    Falls back to default questions if GPT omitted them or the analysis failed.
     """
-    # Get strengths and improvements from the correct location
-    strengths = analysis.get('insights', {}).get('what_went_well', [])
-    improvements = analysis.get('insights', {}).get('growth_opportunities', [])
+    valid = [
+        {"question": q["question"], "answer": q["answer"], "is_free": True}
+        for q in (questions or [])
+        if isinstance(q, dict) and isinstance(q.get("question"), str) and isinstance(q.get("answer"), str)
+    ]
     
-    prompt = f"""Based on this voice analysis, generate 10 training questions to help improve communication skills:
-
-Analysis:
-- Archetype: {analysis.get('archetype')}
-- Strengths: {', '.join(strengths)}
-- Areas for improvement: {', '.join(improvements)}
-- Filler words: {analysis.get('filler_count', 0)}
-- Speaking pace: {analysis.get('speaking_pace', 0)} WPM
-
-Generate 10 questions with answers that address the improvement areas. Make them practical and actionable.
-
-Format as JSON array with this structure:
-[
-  {{
-    "question": "string",
-    "answer": "string",
-    "is_free": boolean (always true)
-  }}
-]
-"""
+    if not valid:
+        return [dict(q) for q in DEFAULT_TRAINING_QUESTIONS]
     
-    try:
-        response = openai_text_client.chat.completions.create(
-            model="gpt-4-turbo",
-            messages=[
-                {"role": "system", "content": "You are an expert communication coach."},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={"type": "json_object"}
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        questions = result.get("questions", [])
-        
-        # Ensure all are marked as free
-        for q in questions:
-            q["is_free"] = True
-        
-        return questions[:10]
-        
-    except Exception as e:
-        logger.error(f"Error generating questions: {str(e)}")
-        # Return default questions
-        return [
-            {
-                "question": "How can I reduce filler words in my speech?",
-                "answer": "Practice pausing instead of using filler words. Record yourself and identify patterns.",
-                "is_free": True
-            },
-            {
-                "question": "What exercises improve speaking clarity?",
-                "answer": "Try tongue twisters, slow reading aloud, and articulation exercises daily.",
-                "is_free": True
-            },
-            {
-                "question": "How do I project more confidence?",
-                "answer": "Maintain good posture, make eye contact, and practice power poses before speaking.",
-                "is_free": True
-            }
-        ]
+    return valid[:10]
 
 # Include the router in the main app
 app.include_router(api_router)
 
+# Comma-separated CORS_ORIGINS pins the allowed origins (e.g. the web app's URL);
+# unset keeps the permissive "*" for local development. Credentialed (cookie)
+# requests are only allowed for pinned origins: with "*" Starlette would echo
+# any Origin back, letting every site make authenticated calls. Bearer-token
+# clients are unaffected either way.
+CORS_ORIGINS = [o.strip() for o in os.environ.get("CORS_ORIGINS", "*").split(",") if o.strip()]
+
 app.add_middleware(
     CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_credentials=CORS_ORIGINS != ["*"],
+    allow_origins=CORS_ORIGINS,
+    allow_methods=["GET", "POST"],
+    allow_headers=["Authorization", "Content-Type"],
 )
 
 # Add global exception handler to log all exceptions
@@ -734,8 +1147,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     """
     logger.warning(f"HTTPException {exc.status_code} on {request.method} {request.url.path}: {exc.detail}")
     # Let FastAPI handle the response normally
-    from fastapi.responses import JSONResponse
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail} if isinstance(exc.detail, str) else exc.detail
     )
@@ -745,16 +1157,36 @@ async def global_exception_handler(request: Request, exc: Exception):
     """
     Global exception handler to log all unhandled exceptions
     """
-    import traceback
-    logger.error(f"Unhandled exception on {request.method} {request.url.path}: {str(exc)}\n{traceback.format_exc()}")
-    from fastapi.responses import JSONResponse
-    return JSONResponse(
+    logger.error("Unhandled exception on %s %s: %s", request.method, request.url.path, exc, exc_info=exc)
+    return ORJSONResponse(
         status_code=500,
         content={"detail": f"Internal server error: {str(exc)}"}
     )
 
+async def ensure_assessment_indexes():
+    """Assessment and training-question indexes, named as in migrations/add_unique_indexes.py."""
+    await create_indexes([
+        (db.assessments, "assessment_id", {"unique": True, "name": "unique_assessment_id"}),
+        # History page (filter by user, newest first) and usage counts by month
+        (db.assessments, [("user_id", 1), ("created_at", -1)], {"name": "idx_user_created_at"}),
+        (db.training_questions, "assessment_id", {"name": "idx_assessment_id"}),
+    ])
+
+@app.on_event("startup")
+async def ensure_db_indexes():
+    await auth_service.ensure_indexes()
+    await ensure_assessment_indexes()
+    if os.environ.get("FEATURE_WARMUP") == "1":
+        # Load (and JIT-warm) the pipeline before the first request instead of during it
+        await asyncio.get_running_loop().run_in_executor(audio_executor, _load_audio_pipeline)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await auth_service.close()
+    await openai_client.close()
+    audio_executor.shutdown(wait=False)
+    if acoustics_executor is not audio_executor:
+        acoustics_executor.shutdown(wait=False, cancel_futures=True)
     client.close()
 
 
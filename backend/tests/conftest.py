@@ -8,6 +8,70 @@ import os
 # Add backend directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# server.py reads these at import; tests mock the clients, so placeholders do
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+# Under `pytest -n auto --dist=loadgroup` every xdist worker is its own process;
+# one BLAS thread each keeps numpy/librosa from oversubscribing the cores
+if os.environ.get("PYTEST_XDIST_WORKER"):
+    from threadpoolctl import threadpool_limits
+    _blas_limits = threadpool_limits(1)
+
+
+def pytest_configure(config):
+    # Registered here too so plain `pytest` (no xdist) doesn't warn on the mark
+    config.addinivalue_line("markers", "xdist_group(name): run these tests on the same xdist worker")
+
+
+def _read_only(audio):
+    """Freeze a shared fixture array so a test can't mutate it for the others"""
+    audio.setflags(write=False)
+    return audio
+
+
+@pytest.fixture(scope="session")
+def random_audio_1s():
+    """1 second of seeded white noise at 16kHz (shared, read-only)"""
+    import numpy as np
+    return _read_only(np.random.default_rng(0).standard_normal(16000).astype(np.float32))
+
+
+@pytest.fixture(scope="session")
+def sine_audio_1s():
+    """1 second of a 200 Hz tone at 16kHz (shared, read-only)"""
+    import numpy as np
+    sr = 16000
+    # float32 end to end: one arange, one in-place sin
+    audio = np.arange(sr, dtype=np.float32)
+    audio *= np.float32(2 * np.pi * 200 / sr)
+    return _read_only(np.sin(audio, out=audio))
+
+
+@pytest.fixture(scope="session")
+def silent_audio_1s():
+    """1 second of silence at 16kHz (shared, read-only)"""
+    import numpy as np
+    return _read_only(np.zeros(16000, dtype=np.float32))
+
+
+@pytest.fixture(scope="session")
+def all_features(random_audio_1s):
+    """extract_all_features on random_audio_1s, computed once for every test that only reads it"""
+    import feature_extractor
+    return feature_extractor.extract_all_features(random_audio_1s, sr=16000)
+
+
+@pytest.fixture(scope="session")
+def warm_client():
+    """One TestClient for every endpoint test, warmed with a request to the API root"""
+    from fastapi.testclient import TestClient
+    from server import app
+    client = TestClient(app)
+    client.get("/api/")
+    return client
+
 
 @pytest.fixture
 def sample_audio_16k():
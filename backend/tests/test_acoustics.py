@@ -0,0 +1,43 @@
+"""
+Tests for acoustics module.
+
+Run with: pytest tests/test_acoustics.py -v
+"""
+import pytest
+import numpy as np
+import os
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import acoustics
+
+# Shares librosa state with test_feature_extractor under --dist=loadgroup
+pytestmark = pytest.mark.xdist_group("librosa")
+
+
+class TestAnalyzeAcoustics:
+    """Tests for analyze_acoustics function"""
+    
+    def test_returns_segments_timing_and_features(self, sample_audio_16k):
+        """Should return VAD segments, timing metrics and all feature groups"""
+        audio, sr = sample_audio_16k
+        
+        segments, timing_metrics, acoustic_features = acoustics.analyze_acoustics(audio, sr, 2.0)
+        
+        assert isinstance(segments, np.ndarray)
+        assert "pause_count" in timing_metrics
+        assert {"prosody", "loudness", "quality", "spectral"} <= set(acoustic_features)
+    
+    def test_runs_in_spawned_worker_process(self, sample_audio_16k):
+        """Should give the same result from a spawn-context process pool (AUDIO_PROCESSES)"""
+        audio, sr = sample_audio_16k
+        
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            segments, timing_metrics, _ = pool.submit(acoustics.analyze_acoustics, audio, sr, 2.0).result(timeout=120)
+        
+        expected_segments, expected_timing, _ = acoustics.analyze_acoustics(audio, sr, 2.0)
+        assert np.array_equal(segments, expected_segments)
+        assert timing_metrics == expected_timing
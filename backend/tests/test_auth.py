@@ -0,0 +1,226 @@
+"""
+Tests for auth module.
+
+Run with: pytest tests/test_auth.py -v
+"""
+import pytest
+import os
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock, AsyncMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+from auth import AuthService
+
+
+def _make_request(token="token-123"):
+    """Minimal stand-in for a Starlette request carrying a session cookie"""
+    return SimpleNamespace(cookies={"session_token": token}, headers={}, state=SimpleNamespace())
+
+
+def _make_service(aggregate_result):
+    db = MagicMock()
+    cursor = MagicMock()
+    cursor.to_list = AsyncMock(return_value=aggregate_result)
+    db.user_sessions.aggregate.return_value = cursor
+    return AuthService(db), db
+
+
+def _make_login_service(user_data):
+    """AuthService whose session API returns user_data (users/sessions left as mocks)"""
+    db = MagicMock()
+    db.user_sessions.update_one = AsyncMock()
+    service = AuthService(db)
+    service._http = MagicMock()
+    service._http.get = AsyncMock(return_value=SimpleNamespace(status_code=200, json=lambda: user_data))
+    return service, db
+
+
+LOGIN_DATA = {
+    "id": "new-id",
+    "email": "a@b.c",
+    "name": "Ana",
+    "picture": None,
+    "session_token": "token-123",
+}
+
+
+class TestGetCurrentUser:
+    """Tests for AuthService.get_current_user"""
+
+    @pytest.mark.asyncio
+    async def test_resolves_user_in_one_query_and_caches(self):
+        """Should join session and user in one aggregate, then serve repeats from cache"""
+        service, db = _make_service([{"user": {"_id": "oid", "id": "u1", "email": "a@b.c"}}])
+
+        first = await service.get_current_user(_make_request())
+        second = await service.get_current_user(_make_request())
+
+        assert first == {"id": "u1", "email": "a@b.c"}
+        assert second == first
+        assert db.user_sessions.aggregate.call_count == 1
+        db.users.find_one.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_reuses_user_within_a_request(self):
+        """Should not hit the session cache or DB twice for the same request"""
+        service, db = _make_service([{"user": {"id": "u1"}}])
+        request = _make_request()
+
+        await service.get_current_user(request)
+        service._session_cache.clear()
+        user = await service.get_current_user(request)
+
+        assert user == {"id": "u1"}
+        assert db.user_sessions.aggregate.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_rejects_missing_token(self):
+        """Should 401 before any lookup when neither cookie nor Bearer token is sent"""
+        service, db = _make_service([])
+        request = SimpleNamespace(cookies={}, headers={}, state=SimpleNamespace())
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.get_current_user(request)
+
+        assert exc_info.value.status_code == 401
+        db.user_sessions.aggregate.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_rejects_expired_session(self):
+        """Should 401 when no valid session matches the token"""
+        service, _ = _make_service([])
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.get_current_user(_make_request())
+
+        assert exc_info.value.status_code == 401
+
+    @pytest.mark.asyncio
+    async def test_missing_user(self):
+        """Should 404 when the session's user no longer exists"""
+        service, _ = _make_service([{}])
+
+        with pytest.raises(HTTPException) as exc_info:
+            await service.get_current_user(_make_request())
+
+        assert exc_info.value.status_code == 404
+
+
+class TestCachedUserId:
+    """Tests for AuthService.cached_user_id"""
+
+    @pytest.mark.asyncio
+    async def test_only_known_sessions_resolve(self):
+        """Should return the id for a validated session and None for unknown tokens"""
+        service, db = _make_service([{"user": {"id": "u1"}}])
+
+        assert service.cached_user_id(_make_request()) is None
+        await service.get_current_user(_make_request())
+
+        assert service.cached_user_id(_make_request()) == "u1"
+        assert service.cached_user_id(_make_request("forged")) is None
+        assert db.user_sessions.aggregate.call_count == 1
+
+
+class TestProcessSessionId:
+    """Tests for AuthService.process_session_id"""
+
+    @pytest.mark.asyncio
+    async def test_existing_user_keeps_account(self):
+        """Should return the stored account without overwriting it"""
+        service, db = _make_login_service(LOGIN_DATA)
+        db.users.find_one_and_update = AsyncMock(return_value={"id": "old-id", "email": "a@b.c", "name": "Ana B"})
+
+        result = await service.process_session_id("sid", MagicMock())
+
+        assert result["id"] == "old-id"
+        assert result["name"] == "Ana B"
+        query, update = db.users.find_one_and_update.await_args.args
+        assert query == {"email": "a@b.c"}
+        assert list(update) == ["$setOnInsert"]
+        assert db.users.find_one_and_update.await_args.kwargs["upsert"] is True
+        assert db.user_sessions.update_one.await_args.args[1]["$setOnInsert"]["user_id"] == "old-id"
+
+    @pytest.mark.asyncio
+    async def test_new_user_is_upserted(self):
+        """Should create the account from the session data in the same call"""
+        service, db = _make_login_service(LOGIN_DATA)
+        db.users.find_one_and_update = AsyncMock(
+            side_effect=lambda query, update, **kwargs: dict(update["$setOnInsert"])
+        )
+        response = MagicMock()
+
+        result = await service.process_session_id("sid", response)
+
+        assert result == {
+            "id": "new-id",
+            "email": "a@b.c",
+            "name": "Ana",
+            "picture": None,
+            "session_token": "token-123"
+        }
+        db.users.find_one.assert_not_called()
+        assert response.set_cookie.call_args.kwargs["value"] == "token-123"
+
+    @pytest.mark.asyncio
+    async def test_lost_upsert_race_reads_winner(self):
+        """Should fall back to the account a concurrent login created"""
+        service, db = _make_login_service(LOGIN_DATA)
+        db.users.find_one_and_update = AsyncMock(side_effect=DuplicateKeyError("E11000"))
+        db.users.find_one = AsyncMock(return_value={"id": "winner-id", "email": "a@b.c", "name": "Ana"})
+
+        result = await service.process_session_id("sid", MagicMock())
+
+        assert result["id"] == "winner-id"
+        db.users.find_one.assert_awaited_once_with({"email": "a@b.c"})
+
+    @pytest.mark.asyncio
+    async def test_lost_race_without_winner_reraises(self):
+        """Should surface the DuplicateKeyError if no account can be found"""
+        service, db = _make_login_service(LOGIN_DATA)
+        db.users.find_one_and_update = AsyncMock(side_effect=DuplicateKeyError("E11000"))
+        db.users.find_one = AsyncMock(return_value=None)
+
+        with pytest.raises(DuplicateKeyError):
+            await service.process_session_id("sid", MagicMock())
+
+        db.user_sessions.update_one.assert_not_called()
+
+
+class TestLogout:
+    """Tests for AuthService.logout"""
+
+    @pytest.mark.asyncio
+    async def test_reads_bearer_token(self):
+        """Should drop the cached and stored session named by the Authorization header"""
+        service, db = _make_service([{"user": {"id": "u1"}}])
+        db.user_sessions.delete_one = AsyncMock()
+        request = SimpleNamespace(cookies={}, headers={"Authorization": "Bearer token-123"}, state=SimpleNamespace())
+        await service.get_current_user(request)
+
+        await service.logout(request, MagicMock())
+
+        db.user_sessions.delete_one.assert_awaited_once_with({"session_token": "token-123"})
+        assert service.cached_user_id(request) is None
+
+
+class TestEnsureIndexes:
+    """Tests for AuthService.ensure_indexes"""
+
+    @pytest.mark.asyncio
+    async def test_one_failing_index_does_not_skip_the_rest(self):
+        """A conflict on the first index should still create the session indexes"""
+        db = MagicMock()
+        db.users.create_index = AsyncMock(side_effect=[Exception("duplicate key"), "unique_user_id"])
+        db.user_sessions.create_index = AsyncMock()
+
+        await AuthService(db).ensure_indexes()
+
+        assert db.users.create_index.await_count == 2
+        names = [call.kwargs["name"] for call in db.user_sessions.create_index.await_args_list]
+        assert names == ["unique_session_token", "idx_user_id", "ttl_expires_at"]
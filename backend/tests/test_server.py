@@ -13,14 +13,14 @@ from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from server import detect_filler_words, GPTInsightsResponse, VoiceAnalysisRequest, MAX_AUDIO_BASE64_CHARS
+
 
 class TestDetectFillerWords:
     """Tests for detect_filler_words function"""
     
     def test_no_fillers(self):
         """Should return empty dict for clean speech"""
-        from server import detect_filler_words
-        
         text = "The quick brown fox jumps over the lazy dog."
         result = detect_filler_words(text)
         
@@ -30,8 +30,6 @@ class TestDetectFillerWords:
     
     def test_detects_common_fillers(self):
         """Should detect um, uh, like, you know, etc."""
-        from server import detect_filler_words
-        
         text = "Um, I think, uh, it was like really good, you know."
         result = detect_filler_words(text)
         
@@ -42,8 +40,6 @@ class TestDetectFillerWords:
     
     def test_case_insensitive(self):
         """Should detect fillers regardless of case"""
-        from server import detect_filler_words
-        
         text = "UM and Um and um"
         result = detect_filler_words(text)
         
@@ -51,8 +47,6 @@ class TestDetectFillerWords:
     
     def test_extended_um_uh(self):
         """Should detect extended fillers like 'umm' and 'uhh'"""
-        from server import detect_filler_words
-        
         text = "Ummmm, I was thinking, uhhhhh, maybe we should go."
         result = detect_filler_words(text)
         
@@ -62,8 +56,6 @@ class TestDetectFillerWords:
     
     def test_counts_multiple_occurrences(self):
         """Should count multiple occurrences correctly"""
-        from server import detect_filler_words
-        
         text = "Actually, I basically think actually we should basically do it."
         result = detect_filler_words(text)
         
@@ -72,8 +64,6 @@ class TestDetectFillerWords:
     
     def test_new_filler_patterns(self):
         """Should detect newly added filler patterns"""
-        from server import detect_filler_words
-        
         text = "I mean, literally, it's honestly kind of hard to explain, right?"
         result = detect_filler_words(text)
         
@@ -82,6 +72,28 @@ class TestDetectFillerWords:
         assert result.get("honestly", 0) == 1
         assert result.get("kind of", 0) == 1
         assert result.get("right", 0) == 1
+    
+    def test_patterns_precompiled(self):
+        """Should scan with the module-level regex, never compiling per call"""
+        import re
+        import server
+        
+        assert isinstance(server._FILLER_RE, re.Pattern)
+        assert server._FILLER_RE.groups == len(server.FILLER_PATTERNS)
+        with patch('server.re.compile', side_effect=AssertionError("compiled per call")):
+            assert detect_filler_words("um, so, like, um") == {"um": 2, "like": 1, "so": 1}
+    
+    def test_memoizes_repeated_transcripts(self):
+        """Should scan a repeated transcript once and hand out independent dicts"""
+        import server
+        
+        server._filler_counts.cache_clear()
+        first = detect_filler_words("Um, you know, um.")
+        first["um"] = 0
+        second = detect_filler_words("Um, you know, um.")
+        
+        assert second == {"um": 2, "you know": 1}
+        assert server._filler_counts.cache_info().hits == 1
 
 
 class TestGPTInsightsResponse:
@@ -89,8 +101,6 @@ class TestGPTInsightsResponse:
     
     def test_provides_defaults(self):
         """Should provide defaults for missing fields"""
-        from server import GPTInsightsResponse
-        
         response = GPTInsightsResponse()
         
         assert response.voice_personality == "Balanced Communicator"
@@ -100,8 +110,6 @@ class TestGPTInsightsResponse:
     
     def test_clamps_scores(self):
         """Should clamp scores to 0-100 range"""
-        from server import GPTInsightsResponse
-        
         response = GPTInsightsResponse(
             overall_score=150,  # Over 100
             clarity_score=-10,  # Under 0
@@ -114,8 +122,6 @@ class TestGPTInsightsResponse:
     
     def test_handles_invalid_score_types(self):
         """Should handle non-numeric scores gracefully"""
-        from server import GPTInsightsResponse
-        
         response = GPTInsightsResponse(
             overall_score="not a number"
         )
@@ -125,8 +131,6 @@ class TestGPTInsightsResponse:
     
     def test_accepts_valid_response(self):
         """Should accept fully valid GPT response"""
-        from server import GPTInsightsResponse
-        
         valid_data = {
             "voice_personality": "Dynamic Storyteller",
             "headline": "Your voice captivates listeners",
@@ -148,13 +152,101 @@ class TestGPTInsightsResponse:
         assert len(response.key_insights) == 2
 
 
+class TestBuildTrainingQuestions:
+    """Tests for build_training_questions function"""
+    
+    def test_normalizes_gpt_questions(self):
+        """Should keep valid questions, mark them free and cap at 10"""
+        from server import build_training_questions
+        
+        questions = [{"question": f"Q{i}", "answer": f"A{i}", "is_free": False} for i in range(12)]
+        questions.insert(0, {"question": "missing answer"})
+        result = build_training_questions(questions)
+        
+        assert len(result) == 10
+        assert result[0] == {"question": "Q0", "answer": "A0", "is_free": True}
+    
+    def test_falls_back_to_defaults(self):
+        """Should return default questions when GPT returned none"""
+        from server import build_training_questions, DEFAULT_TRAINING_QUESTIONS
+        
+        assert build_training_questions(None) == DEFAULT_TRAINING_QUESTIONS
+        assert build_training_questions([]) == DEFAULT_TRAINING_QUESTIONS
+
+
+class TestSaveTrainingQuestions:
+    """Tests for _save_training_questions helper"""
+    
+    @pytest.mark.asyncio
+    async def test_swallows_insert_errors(self):
+        """Should log, not raise, when the insert fails"""
+        import server
+        
+        with patch('server.db') as mock_db:
+            mock_db.training_questions.insert_one = AsyncMock(side_effect=Exception("boom"))
+            
+            await server._save_training_questions("a1", None, datetime.now())
+            
+            saved = mock_db.training_questions.insert_one.await_args.args[0]
+            assert saved["questions"] == server.DEFAULT_TRAINING_QUESTIONS
+
+
+class TestAnalyzeWithGPT:
+    """Tests for _analyze_with_gpt helper"""
+    
+    @pytest.mark.asyncio
+    async def test_memoizes_by_prompt(self):
+        """Should call GPT once per distinct prompt and cache only successes"""
+        import server
+        
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock()]
+        mock_response.choices[0].message.content = json.dumps({"overall_score": 90})
+        
+        server._gpt_analysis_cache.clear()
+        with patch('server.openai_client') as mock_text:
+            mock_text.chat.completions.create = AsyncMock(return_value=mock_response)
+            
+            first = await server._analyze_with_gpt("prompt")
+            first["overall_score"] = 0  # Callers mutating results must not poison the cache
+            second = await server._analyze_with_gpt("prompt")
+            
+            assert second["overall_score"] == 90
+            assert mock_text.chat.completions.create.await_count == 1
+            
+            mock_text.chat.completions.create = AsyncMock(side_effect=Exception("boom"))
+            assert await server._analyze_with_gpt("other prompt") == {}
+            assert len(server._gpt_analysis_cache) == 1
+        server._gpt_analysis_cache.clear()
+
+
+class TestLazyImport:
+    """Tests for _lazy_import"""
+
+    def test_defers_module_execution(self):
+        """Should not run the module until an attribute is accessed"""
+        from server import _lazy_import
+
+        with patch.dict(sys.modules):
+            sys.modules.pop("prompt_builder", None)
+            module = _lazy_import("prompt_builder")
+            assert "SYSTEM_PROMPT" not in object.__getattribute__(module, "__dict__")
+
+            assert module.SYSTEM_MESSAGE["role"] == "system"
+
+    def test_reuses_loaded_module(self):
+        """Should return the already-imported module as-is"""
+        import audio_utils
+        from server import _lazy_import
+
+        assert _lazy_import("audio_utils") is audio_utils
+
+
 class TestVoiceAnalysisRequest:
     """Tests for VoiceAnalysisRequest model"""
     
     def test_accepts_valid_request(self):
         """Should accept valid request data"""
-        from server import VoiceAnalysisRequest
-        
         request = VoiceAnalysisRequest(
             audio_base64="SGVsbG8gV29ybGQ=",
             user_id="test-user-123",
@@ -164,6 +256,32 @@ class TestVoiceAnalysisRequest:
         
         assert request.user_id == "test-user-123"
         assert request.recording_time == 30
+    
+    def test_rejects_oversized_input(self):
+        """Should reject oversized audio and implausible recording times before decoding"""
+        from pydantic import ValidationError
+        
+        with pytest.raises(ValidationError):
+            VoiceAnalysisRequest(
+                audio_base64="A" * (MAX_AUDIO_BASE64_CHARS + 4),
+                user_id="test-user-123",
+                recording_mode="freestyle",
+                recording_time=30
+            )
+        with pytest.raises(ValidationError):
+            VoiceAnalysisRequest(
+                audio_base64="SGVsbG8gV29ybGQ=",
+                user_id="test-user-123",
+                recording_mode="freestyle",
+                recording_time=3600
+            )
+    
+    def test_base64_cap_matches_audio_limit(self):
+        """Base64 cap should admit exactly MAX_AUDIO_SIZE_MB of decoded audio"""
+        import math
+        import audio_utils
+        
+        assert MAX_AUDIO_BASE64_CHARS == 4 * math.ceil(audio_utils.MAX_AUDIO_SIZE_MB * 1024 * 1024 / 3)
 
 
 # Integration tests require mocking external services
@@ -176,8 +294,12 @@ class TestAnalyzeVoiceEndpoint:
         with patch('server.auth_service') as mock_auth, \
              patch('server.usage_service') as mock_usage, \
              patch('server.db') as mock_db, \
-             patch('server.openai_audio_client') as mock_audio, \
-             patch('server.openai_text_client') as mock_text:
+             patch('server.openai_client') as mock_openai, \
+             patch('server.limiter.enabled', False):
+            
+            import server
+            server._recent_submissions.clear()
+            server._gpt_analysis_cache.clear()
             
             # Setup auth mock
             mock_auth.get_current_user = AsyncMock(return_value={"id": "test-user"})
@@ -191,7 +313,10 @@ class TestAnalyzeVoiceEndpoint:
             mock_db.training_questions.insert_one = AsyncMock()
             
             # Setup OpenAI audio mock
-            mock_audio.audio.transcriptions.create.return_value = "Hello, this is a test transcription."
+            mock_openai.audio.transcriptions.create = AsyncMock(return_value=(
+                "Hello, this is a test transcription. It is long enough to be worth sending "
+                "to GPT for a full narrative analysis of the recording."
+            ))
             
             # Setup OpenAI text mock
             mock_gpt_response = MagicMock()
@@ -209,37 +334,412 @@ class TestAnalyzeVoiceEndpoint:
                 "confidence_score": 75,
                 "actionable_tips": []
             })
-            mock_text.chat.completions.create.return_value = mock_gpt_response
+            mock_openai.chat.completions.create = AsyncMock(return_value=mock_gpt_response)
             
             yield {
                 "auth": mock_auth,
                 "usage": mock_usage,
                 "db": mock_db,
-                "audio": mock_audio,
-                "text": mock_text
+                "audio": mock_openai,
+                "text": mock_openai
             }
     
-    @pytest.mark.asyncio
-    async def test_requires_authentication(self):
+    def test_requires_authentication(self, warm_client):
         """Should require authentication"""
-        from fastapi.testclient import TestClient
-        from server import app
-        
-        client = TestClient(app)
+        from fastapi import HTTPException
         
         # Without auth, should fail
         with patch('server.auth_service.get_current_user', 
-                   AsyncMock(side_effect=Exception("Unauthorized"))):
-            response = client.post("/api/analyze-voice", json={
+                   AsyncMock(side_effect=HTTPException(status_code=401, detail="Not authenticated"))):
+            response = warm_client.post("/api/analyze-voice", json={
                 "audio_base64": "test",
                 "user_id": "test",
                 "recording_mode": "freestyle",
                 "recording_time": 30
             })
             
-            # Should return error (either 401 or 500 depending on implementation)
+            assert response.status_code == 401
+    
+    def test_authenticates_before_decoding(self, mock_services, warm_client):
+        """An unauthenticated request should 401 even with an undecodable payload"""
+        from fastapi import HTTPException
+        
+        mock_services["auth"].get_current_user = AsyncMock(side_effect=HTTPException(status_code=401, detail="Not authenticated"))
+        with patch('server.audio_utils.decode_base64_payload') as mock_decode:
+            for path in ("/api/analyze-voice", "/api/analyze-voice/stream"):
+                response = warm_client.post(path, json={
+                    "audio_base64": "not-valid-base64!!!",
+                    "user_id": "test",
+                    "recording_mode": "freestyle",
+                    "recording_time": 30
+                })
+                assert response.status_code == 401
+        
+        mock_decode.assert_not_called()
+
+    
+    def test_completes_with_async_openai_clients(self, mock_services, sample_audio_16k, warm_client):
+        """Should await Whisper and GPT and store the finished analysis"""
+        import base64
+        import io
+        import soundfile as sf
+        
+        audio, sr = sample_audio_16k
+        buf = io.BytesIO()
+        sf.write(buf, audio, sr, format='WAV')
+        
+        response = warm_client.post("/api/analyze-voice", json={
+            "audio_base64": base64.b64encode(buf.getvalue()).decode(),
+            "user_id": "test",
+            "recording_mode": "freestyle",
+            "recording_time": 2
+        })
+        
+        assert response.status_code == 200
+        assert response.json()["status"] == "completed"
+        mock_services["audio"].audio.transcriptions.create.assert_awaited_once()
+        update = mock_services["db"].assessments.update_one.await_args[0][1]["$set"]
+        assert update["processed"] is True
+        assert update["analysis"]["overall_score"] == 80
+        assessment = mock_services["db"].assessments.insert_one.await_args[0][0]
+        assert "audio_data" not in assessment
+        # Training questions ride along in the single GPT call
+        mock_services["text"].chat.completions.create.assert_awaited_once()
+        mock_services["db"].training_questions.insert_one.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_skips_gpt_for_short_transcripts(self, mock_services, sample_audio_16k):
+        """Should fall back to rule-based insights without calling GPT"""
+        import server
+        
+        mock_services["audio"].audio.transcriptions.create = AsyncMock(return_value="Hello there.")
+        
+        await server._process_assessment("a1", "test-user", lambda: sample_audio_16k)
+        
+        mock_services["text"].chat.completions.create.assert_not_awaited()
+        update = mock_services["db"].assessments.update_one.await_args[0][1]["$set"]
+        assert update["analysis"]["overall_score"] == 75
+        saved = mock_services["db"].training_questions.insert_one.await_args[0][0]
+        assert saved["questions"] == server.DEFAULT_TRAINING_QUESTIONS
+    
+    @pytest.mark.asyncio
+    async def test_audio_stages_run_off_event_loop(self, mock_services, sample_audio_16k):
+        """Decoding and WAV encoding should run on the audio executor, not the event loop thread"""
+        import threading
+        import server
+        
+        threads = []
+        def load_audio():
+            threads.append(threading.current_thread().name)
+            return sample_audio_16k
+        
+        encode_wav = server.audio_utils.encode_wav
+        def encode_on_thread(audio, sr):
+            threads.append(threading.current_thread().name)
+            return encode_wav(audio, sr)
+
+        with patch('server.audio_utils.encode_wav', encode_on_thread):
+            await server._process_assessment("a1", "test-user", load_audio)
+
+        assert len(threads) == 2
+        assert all(name.startswith("audio") for name in threads)
+        mock_services["db"].assessments.update_one.assert_awaited_once()
+    
+    @pytest.mark.asyncio
+    async def test_archives_audio_to_gridfs_when_enabled(self, mock_services, sample_audio_16k):
+        """With STORE_AUDIO, the WAV goes to GridFS and only its id is stored"""
+        import server
+        
+        with patch('server.STORE_AUDIO', True), patch('server.AsyncIOMotorGridFSBucket') as mock_bucket_cls:
+            mock_bucket = mock_bucket_cls.return_value
+            mock_bucket.upload_from_stream_with_id = AsyncMock()
+            await server._process_assessment("a1", "test-user", lambda: sample_audio_16k)
+        
+        file_id, filename, data = mock_bucket.upload_from_stream_with_id.await_args[0]
+        assert (file_id, filename) == ("a1", "a1.wav")
+        assert data[:4] == b"RIFF"
+        update = mock_services["db"].assessments.update_one.await_args[0][1]["$set"]
+        assert update["audio_id"] == "a1"
+    
+    def test_background_mode_returns_202(self, mock_services, warm_client):
+        """Should queue the pipeline and respond before it runs"""
+        with patch('server._process_assessment', AsyncMock()) as mock_process:
+            response = warm_client.post("/api/analyze-voice?background=true", json={
+                "audio_base64": "test",
+                "user_id": "test",
+                "recording_mode": "freestyle",
+                "recording_time": 30
+            })
+        
+        assert response.status_code == 202
+        assert response.json()["status"] == "processing"
+        mock_services["db"].assessments.insert_one.assert_awaited_once()
+        mock_process.assert_awaited_once()
+    
+    def test_rejects_non_positive_recording_time(self, mock_services, warm_client):
+        """Should 400 before creating an assessment or calling OpenAI"""
+        response = warm_client.post("/api/analyze-voice", json={
+            "audio_base64": "test",
+            "user_id": "test",
+            "recording_mode": "freestyle",
+            "recording_time": 0
+        })
+        
+        assert response.status_code == 400
+        mock_services["db"].assessments.insert_one.assert_not_called()
+        mock_services["audio"].audio.transcriptions.create.assert_not_called()
+    
+    def test_duplicate_submission_reuses_assessment(self, mock_services, warm_client):
+        """Should hand back the earlier assessment_id for an identical resubmit"""
+        payload = {
+            "audio_base64": "test",
+            "user_id": "test",
+            "recording_mode": "freestyle",
+            "recording_time": 30
+        }
+        
+        with patch('server._process_assessment', AsyncMock()):
+            first = warm_client.post("/api/analyze-voice?background=true", json=payload)
+            second = warm_client.post("/api/analyze-voice?background=true", json=payload)
+        
+        assert second.json()["status"] == "duplicate"
+        assert second.json()["assessment_id"] == first.json()["assessment_id"]
+        mock_services["db"].assessments.insert_one.assert_awaited_once()
+
+    def test_unexpected_failure_allows_resubmit(self, mock_services, warm_client):
+        """A non-HTTP pipeline failure should 500 and free the payload for a retry"""
+        payload = {
+            "audio_base64": "test",
+            "user_id": "test",
+            "recording_mode": "freestyle",
+            "recording_time": 30
+        }
+
+        with patch('server._process_assessment', AsyncMock(side_effect=RuntimeError("boom"))):
+            first = warm_client.post("/api/analyze-voice", json=payload)
+            second = warm_client.post("/api/analyze-voice", json=payload)
+
+        assert first.status_code == 500
+        assert second.status_code == 500
+        assert mock_services["db"].assessments.insert_one.await_count == 2
+
+    def test_rejects_invalid_base64(self, mock_services, warm_client):
+        """Should 400 on an undecodable payload without creating an assessment"""
+        response = warm_client.post("/api/analyze-voice", json={
+            "audio_base64": "not-valid-base64!!!",
+            "user_id": "test",
+            "recording_mode": "freestyle",
+            "recording_time": 30
+        })
+        
+        assert response.status_code == 400
+        mock_services["db"].assessments.insert_one.assert_not_called()
+    
+    def test_stream_reports_transcription_then_analysis(self, mock_services, sample_audio_16k, warm_client):
+        """Streaming endpoint should emit accepted, transcription and completed events in order"""
+        import base64
+        import io
+        import soundfile as sf
+        
+        audio, sr = sample_audio_16k
+        buf = io.BytesIO()
+        sf.write(buf, audio, sr, format='WAV')
+        
+        response = warm_client.post("/api/analyze-voice/stream", json={
+            "audio_base64": base64.b64encode(buf.getvalue()).decode(),
+            "user_id": "test",
+            "recording_mode": "freestyle",
+            "recording_time": 2
+        })
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = []
+        for block in response.text.strip().split("\n\n"):
+            event_line, data_line = block.split("\n")
+            events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+        
+        assert [name for name, _ in events] == ["accepted", "transcription", "completed"]
+        assert events[1][1]["text"].startswith("Hello, this is a test transcription.")
+        assert events[2][1]["assessment_id"] == events[0][1]["assessment_id"]
+        assert events[2][1]["analysis"]["overall_score"] == 80
+
+    def test_stream_ends_with_error_on_unexpected_failure(self, mock_services, warm_client):
+        """A non-HTTP failure should still end the stream and free the dedupe key"""
+        import server
+    
+        with patch('server._process_assessment', AsyncMock(side_effect=RuntimeError("boom"))):
+            response = warm_client.post("/api/analyze-voice/stream", json={
+                "audio_base64": "test",
+                "user_id": "test",
+                "recording_mode": "freestyle",
+                "recording_time": 30
+            })
+    
+        names = [block.split("\n")[0] for block in response.text.strip().split("\n\n")]
+        assert names == ["event: accepted", "event: error"]
+        assert "boom" in response.text
+        assert len(server._recent_submissions) == 0
+    
+    def test_stream_rejects_unauthenticated_before_streaming(self, mock_services, warm_client):
+        """Auth failures should be plain HTTP errors, not SSE events"""
+        from fastapi import HTTPException
+        
+        mock_services["auth"].get_current_user = AsyncMock(side_effect=HTTPException(status_code=401, detail="Not authenticated"))
+        response = warm_client.post("/api/analyze-voice/stream", json={
+            "audio_base64": "test",
+            "user_id": "test",
+            "recording_mode": "freestyle",
+            "recording_time": 30
+        })
+        
+        assert response.status_code == 401
+        mock_services["db"].assessments.insert_one.assert_not_called()
+    
+    def test_upload_requires_authentication(self, warm_client):
+        """Multipart upload endpoint should also require authentication"""
+        with patch('server.auth_service.get_current_user',
+                   AsyncMock(side_effect=Exception("Unauthorized"))):
+            response = warm_client.post(
+                "/api/analyze-voice/upload",
+                files={"audio": ("recording.wav", b"RIFF" + b"\x00" * 100, "audio/wav")},
+                data={"recording_mode": "freestyle", "recording_time": "30"}
+            )
+            
             assert response.status_code >= 400
 
 
+
+class TestGetAssessmentEndpoint:
+    """Tests for /assessment/{id} endpoint"""
+    
+    def test_merges_training_questions(self, warm_client):
+        """Should return the assessment with its training questions attached"""
+        with patch('server.auth_service') as mock_auth, patch('server.db') as mock_db:
+            mock_auth.get_current_user = AsyncMock(return_value={"id": "test-user"})
+            mock_db.assessments.find_one = AsyncMock(return_value={
+                "_id": "mongo-id", "assessment_id": "a1", "user_id": "test-user"
+            })
+            mock_db.training_questions.find_one = AsyncMock(return_value={
+                "_id": "mongo-id", "questions": [{"question": "q", "answer": "a"}]
+            })
+            
+            response = warm_client.get("/api/assessment/a1")
+        
+        assert response.status_code == 200
+        body = response.json()
+        assert "_id" not in body
+        assert body["training_questions"] == [{"question": "q", "answer": "a"}]
+    
+    def test_serializes_numpy_and_datetimes(self, warm_client):
+        """Should encode numpy values and datetimes without jsonable_encoder"""
+        created_at = datetime(2024, 1, 2, 3, 4, 5)
+        with patch('server.auth_service') as mock_auth, patch('server.db') as mock_db:
+            mock_auth.get_current_user = AsyncMock(return_value={"id": "test-user"})
+            mock_db.assessments.find_one = AsyncMock(return_value={
+                "assessment_id": "a1", "created_at": created_at,
+                "analysis": {"pitch_series": {"f0": np.array([120.5, 130.0])}, "wpm": np.float64(140.0)}
+            })
+            mock_db.training_questions.find_one = AsyncMock(return_value=None)
+            
+            body = warm_client.get("/api/assessment/a1").json()
+        
+        assert body["created_at"] == created_at.isoformat()
+        assert body["analysis"] == {"pitch_series": {"f0": [120.5, 130.0]}, "wpm": 140.0}
+    
+    def test_hides_other_users_assessment(self, warm_client):
+        """Should 404 when the assessment isn't owned by the caller"""
+        with patch('server.auth_service') as mock_auth, patch('server.db') as mock_db:
+            mock_auth.get_current_user = AsyncMock(return_value={"id": "test-user"})
+            mock_db.assessments.find_one = AsyncMock(return_value=None)
+            mock_db.training_questions.find_one = AsyncMock(return_value={"questions": []})
+            
+            response = warm_client.get("/api/assessment/a1")
+        
+        assert response.status_code == 404
+
+
+class TestGetAssessmentsEndpoint:
+    """Tests for /assessments endpoint"""
+    
+    def test_returns_page_and_total_from_one_aggregate(self, warm_client):
+        """Should unpack the $facet result into assessments and total"""
+        with patch('server.auth_service') as mock_auth, patch('server.db') as mock_db:
+            mock_auth.get_current_user = AsyncMock(return_value={"id": "test-user"})
+            cursor = MagicMock()
+            cursor.to_list = AsyncMock(return_value=[{
+                "assessments": [{"assessment_id": "a2"}, {"assessment_id": "a1"}],
+                "total": [{"n": 7}]
+            }])
+            mock_db.assessments.aggregate.return_value = cursor
+            
+            response = warm_client.get("/api/assessments?limit=2&skip=0")
+        
+        assert response.status_code == 200
+        assert response.json() == {
+            "assessments": [{"assessment_id": "a2"}, {"assessment_id": "a1"}],
+            "total": 7
+        }
+        pipeline = mock_db.assessments.aggregate.call_args[0][0]
+        assert pipeline[0] == {"$match": {"user_id": "test-user"}}
+    
+    def test_empty_history(self, warm_client):
+        """Should report zero total when the user has no assessments"""
+        with patch('server.auth_service') as mock_auth, patch('server.db') as mock_db:
+            mock_auth.get_current_user = AsyncMock(return_value={"id": "test-user"})
+            cursor = MagicMock()
+            cursor.to_list = AsyncMock(return_value=[{"assessments": [], "total": []}])
+            mock_db.assessments.aggregate.return_value = cursor
+            
+            response = warm_client.get("/api/assessments")
+        
+        assert response.json() == {"assessments": [], "total": 0}
+
+    @pytest.mark.parametrize("query", ["limit=0", "limit=101", "skip=-1"])
+    def test_rejects_out_of_range_paging(self, query, warm_client):
+        """Should 422 on paging values outside limit 1-100 / skip >= 0"""
+        with patch('server.auth_service') as mock_auth, patch('server.db') as mock_db:
+            mock_auth.get_current_user = AsyncMock(return_value={"id": "test-user"})
+
+            response = warm_client.get(f"/api/assessments?{query}")
+
+        assert response.status_code == 422
+        mock_db.assessments.aggregate.assert_not_called()
+
+
+class TestCORS:
+    """Tests for the CORS middleware configuration"""
+    
+    def test_preflight_allows_auth_header(self, warm_client):
+        """Preflight from the app should allow the Authorization header"""
+        response = warm_client.options("/api/assessments", headers={
+            "Origin": "https://app.example.com",
+            "Access-Control-Request-Method": "GET",
+            "Access-Control-Request-Headers": "Authorization",
+        })
+        
+        assert response.status_code == 200
+        assert "authorization" in response.headers["access-control-allow-headers"].lower()
+    
+    def test_wildcard_origin_never_allows_credentials(self, warm_client):
+        """With the default "*", no origin should get a credentialed response"""
+        from server import CORS_ORIGINS
+        
+        assert CORS_ORIGINS == ["*"]
+        preflight = warm_client.options("/api/assessments", headers={
+            "Origin": "https://evil.example.com",
+            "Access-Control-Request-Method": "GET",
+        })
+        with patch('server.auth_service') as mock_auth:
+            mock_auth.get_current_user = AsyncMock(return_value={"id": "u1", "email": "a@b.c", "name": "U"})
+            simple = warm_client.get("/api/auth/me", headers={
+                "Origin": "https://evil.example.com",
+                "Cookie": "session_token=abc",
+            })
+        
+        assert "access-control-allow-credentials" not in preflight.headers
+        assert "access-control-allow-credentials" not in simple.headers
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
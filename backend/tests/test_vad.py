@@ -7,6 +7,7 @@ import pytest
 import numpy as np
 import os
 import sys
+from unittest.mock import patch
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -16,28 +17,38 @@ import vad
 class TestSegmentSpeech:
     """Tests for segment_speech function"""
     
+    @pytest.fixture(autouse=True)
+    def empty_segment_cache(self):
+        """Every test runs the VAD instead of reading an earlier test's segments"""
+        vad._segment_cache.clear()
+    
     def test_rejects_invalid_sample_rate(self):
         """Should raise error for unsupported sample rates"""
         audio = np.zeros(1000)
         with pytest.raises(ValueError, match="not supported"):
             vad.segment_speech(audio, sr=22050)  # Not a valid WebRTC VAD rate
     
+    def test_rejects_invalid_frame_duration(self):
+        """Should raise error for frame durations WebRTC VAD cannot process"""
+        audio = np.zeros(16000)
+        with pytest.raises(ValueError, match="not supported"):
+            vad.segment_speech(audio, sr=16000, frame_duration_ms=25)
+    
     def test_accepts_valid_sample_rates(self):
         """Should accept 8000, 16000, 32000, 48000 Hz"""
         for sr in [8000, 16000, 32000, 48000]:
             audio = np.zeros(sr)  # 1 second of silence
             segments = vad.segment_speech(audio, sr)
-            assert isinstance(segments, list)
+            assert segments.dtype == vad.SEGMENT_DTYPE
     
     def test_returns_segments_with_correct_structure(self):
-        """Should return segments with start_s, end_s, type"""
+        """Should return segment records with start_s, end_s, is_speech"""
         audio = np.zeros(16000)  # 1 second
         segments = vad.segment_speech(audio, sr=16000)
         
-        for segment in segments:
-            assert "start_s" in segment
-            assert "end_s" in segment
-            assert "type" in segment
+        assert segments.dtype.names == ("start_s", "end_s", "is_speech")
+        for segment in vad.segments_to_dicts(segments):
+            assert set(segment) == {"start_s", "end_s", "type"}
             assert segment["type"] in ["speech", "silence"]
     
     def test_silent_audio_returns_silence_segments(self):
@@ -48,14 +59,88 @@ class TestSegmentSpeech:
         # Should have at least one segment
         assert len(segments) > 0
         # All segments should be silence
-        for segment in segments:
-            assert segment["type"] == "silence"
+        assert not segments["is_speech"].any()
+    
+    def test_digital_silence_skips_vad(self):
+        """All-zero audio should be one silence segment without running the VAD"""
+        audio = np.zeros(16000 + 100)  # 1 second plus a partial frame
+        
+        with patch.object(vad, "_speech_flags") as flags:
+            segments = vad.segment_speech(audio, sr=16000)
+        
+        flags.assert_not_called()
+        assert vad.segments_to_dicts(segments) == [{"start_s": 0.0, "end_s": 0.99, "type": "silence"}]
     
     def test_handles_short_audio(self):
         """Should handle audio shorter than frame size"""
         audio = np.zeros(100)  # Very short
         segments = vad.segment_speech(audio, sr=16000, frame_duration_ms=30)
-        assert isinstance(segments, list)
+        assert len(segments) == 0
+    
+    def test_int16_conversion_clips_out_of_range_samples(self):
+        """Samples past +/-1 should saturate instead of wrapping around"""
+        audio = np.array([1.7, -2.0, 0.5, -0.25, 0.0])
+        
+        pcm = vad._to_int16_pcm(audio)
+        
+        assert pcm.dtype == np.int16
+        assert pcm.tolist() == [32767, -32768, 16384, -8192, 0]
+    
+    def test_int16_kernel_matches_numpy(self):
+        """The numba conversion should round ties and clip exactly like the NumPy path"""
+        rng = np.random.default_rng(0)
+        audio = np.concatenate([rng.standard_normal(4000) * 0.7, (np.arange(1000) + 0.5) / 32767])
+        
+        for dtype in (np.float32, np.float64):
+            samples = audio.astype(dtype)
+            assert np.array_equal(vad._to_int16_pcm(samples), vad._int16_pcm_numpy(samples))
+    
+    @pytest.mark.skipif(vad._webrtc_vad is None, reason="WebRTC VAD C API not exported")
+    def test_kernel_matches_webrtcvad(self):
+        """The numba kernel should flag exactly the frames webrtcvad.Vad does"""
+        rng = np.random.default_rng(0)
+        audio = np.concatenate([rng.standard_normal(8000) * 0.12, np.zeros(8000)] * 3)
+        frames2d = vad._to_int16_pcm(audio)[:480 * 100].reshape(100, 480)
+        
+        assert vad._speech_flags(frames2d, 16000) == vad._speech_flags_python(frames2d, 16000)
+    
+    def test_runs_of_flags_become_segments(self):
+        """Consecutive frames with the same flag should merge into one segment"""
+        audio = np.full(480 * 5, 0.01)  # 5 frames of 30ms at 16kHz
+        flags = [False, True, True, False, False]
+        
+        with patch.object(vad, "_speech_flags", return_value=flags):
+            segments = vad.segment_speech(audio, sr=16000)
+        
+        assert vad.segments_to_dicts(segments) == [
+            {"start_s": 0.0, "end_s": 0.03, "type": "silence"},
+            {"start_s": 0.03, "end_s": 0.09, "type": "speech"},
+            {"start_s": 0.09, "end_s": 0.15, "type": "silence"},
+        ]
+    
+    def test_results_do_not_depend_on_previous_call(self):
+        """VAD state (hangover, noise model) must not leak between recordings"""
+        rng = np.random.default_rng(0)
+        noise = rng.standard_normal(16000 * 3) * 0.12
+        silence = np.zeros(16000 * 3)
+        
+        expected = vad.segment_speech(silence, sr=16000)
+        vad.segment_speech(noise, sr=16000)
+        
+        assert np.array_equal(vad.segment_speech(silence, sr=16000), expected)
+    
+    def test_repeat_audio_reuses_cached_segments(self):
+        """The same recording should only be run through the VAD once"""
+        audio = np.full(480 * 5, 0.01)
+        
+        with patch.object(vad, "_speech_flags", return_value=[False, True, True, False, False]) as flags:
+            first = vad.segment_speech(audio, sr=16000)
+            first["is_speech"][0] = True  # callers may mutate what they get back
+            second = vad.segment_speech(audio.copy(), sr=16000)
+        
+        assert flags.call_count == 1
+        assert not second["is_speech"][0]
+        assert len(second) == 3
 
 
 class TestComputeTimingMetrics:
@@ -117,6 +202,18 @@ class TestComputeTimingMetrics:
         
         assert len(metrics["long_pauses"]) == 1
         assert metrics["long_pauses"][0]["duration_ms"] == 1000
+    
+    def test_accepts_segment_array(self):
+        """segment_speech's record array and the dict form should give the same metrics"""
+        segments = [
+            {"start_s": 0, "end_s": 1, "type": "speech"},
+            {"start_s": 1, "end_s": 1.9, "type": "silence"},
+            {"start_s": 1.9, "end_s": 3, "type": "speech"},
+        ]
+        array = vad._as_segment_array(segments)
+        
+        assert vad.segments_to_dicts(array) == segments
+        assert vad.compute_timing_metrics(array, 3.0) == vad.compute_timing_metrics(segments, 3.0)
 
 
 class TestGetSpeechOnlyAudio:
@@ -1,11 +1,16 @@
 """
 Voice Activity Detection and timing analysis.
 """
-from typing import List, Dict
+from typing import List, Dict, Union
+import ctypes
+import hashlib
 import logging
+import os
+import threading
 import numpy as np
 import webrtcvad
-import struct
+from cachetools import LRUCache
+from numba import config as numba_config, njit
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +19,155 @@ VAD_AGGRESSIVENESS = 2  # 0-3, higher = more aggressive (less false positives)
 MEANINGFUL_PAUSE_MS = 200  # Minimum pause duration to count
 LONG_PAUSE_MS = 700  # Threshold for "long" pauses
 
+# One record per VAD segment; 17 bytes a row instead of a dict per segment
+SEGMENT_DTYPE = np.dtype([("start_s", "f8"), ("end_s", "f8"), ("is_speech", "?")])
 
-def segment_speech(audio: np.ndarray, sr: int, frame_duration_ms: int = 30) -> List[Dict]:
+# Segments of recently analyzed audio, keyed by PCM digest, sample rate and frame duration
+SEGMENT_CACHE_SIZE = 256
+_segment_cache = LRUCache(maxsize=SEGMENT_CACHE_SIZE)
+_segment_cache_lock = threading.Lock()  # segment_speech runs on several audio threads
+
+
+def _as_segment_array(segments: Union[np.ndarray, List[Dict]]) -> np.ndarray:
+    """Segments as a SEGMENT_DTYPE array; also accepts a list of segment dicts."""
+    if isinstance(segments, np.ndarray):
+        return segments
+    array = np.empty(len(segments), dtype=SEGMENT_DTYPE)
+    array["start_s"] = [segment["start_s"] for segment in segments]
+    array["end_s"] = [segment["end_s"] for segment in segments]
+    array["is_speech"] = [segment["type"] == "speech" for segment in segments]
+    return array
+
+
+def segments_to_dicts(segments: np.ndarray) -> List[Dict]:
+    """Segments as {start_s, end_s, type} dicts, for JSON responses or storage."""
+    return [
+        {"start_s": start, "end_s": end, "type": "speech" if is_speech else "silence"}
+        for start, end, is_speech in segments.tolist()
+    ]
+
+
+# Serial for the same reason as audio_utils._normalize_kernel: segment_speech
+# runs on several audio threads at once, and the pass is memory-bound anyway
+@njit(cache=True)
+def _int16_pcm_kernel(audio: np.ndarray, out: np.ndarray) -> None:
+    """Fused scale + clip + round-half-even to int16, in float32 like _int16_pcm_numpy."""
+    scale = np.float32(32767.0)
+    for i in range(audio.size):
+        v = np.float32(audio[i]) * scale
+        if v > 32767.0:
+            v = np.float32(32767.0)
+        elif v < -32768.0:
+            v = np.float32(-32768.0)
+        out[i] = np.int16(np.rint(v))
+
+
+def _to_int16_pcm(audio: np.ndarray) -> np.ndarray:
+    """
+    Scale float audio (-1 to 1) to int16 PCM in one pass.
+    
+    Out-of-range samples are clipped rather than wrapping around on the
+    cast, and values are rounded to the nearest step instead of truncated.
+    """
+    audio = np.ascontiguousarray(audio).ravel()
+    
+    # With NUMBA_DISABLE_JIT the kernel would run as a per-sample Python loop
+    if numba_config.DISABLE_JIT:
+        return _int16_pcm_numpy(audio)
+    
+    out = np.empty(audio.shape, dtype=np.int16)
+    _int16_pcm_kernel(audio, out)
+    return out
+
+
+def _int16_pcm_numpy(audio: np.ndarray) -> np.ndarray:
+    """Numpy equivalent of _int16_pcm_kernel, through a single float32 buffer."""
+    scaled = np.multiply(audio, 32767.0, dtype=np.float32)
+    np.clip(scaled, -32768, 32767, out=scaled)
+    np.rint(scaled, out=scaled)
+    return scaled.astype(np.int16)
+
+
+def _bind_webrtc_vad():
+    """
+    ctypes bindings to the WebRTC VAD C API inside webrtcvad's extension module,
+    or None if this build doesn't export the symbols.
+    """
+    try:
+        lib = ctypes.CDLL(webrtcvad._webrtcvad.__file__)
+        create, init, set_mode, process, free = (
+            lib.WebRtcVad_Create, lib.WebRtcVad_Init, lib.WebRtcVad_set_mode,
+            lib.WebRtcVad_Process, lib.WebRtcVad_Free,
+        )
+    except (AttributeError, OSError) as e:
+        logger.info(f"WebRTC VAD C API not available, using webrtcvad.Vad: {e}")
+        return None
+    
+    create.argtypes, create.restype = [ctypes.POINTER(ctypes.c_void_p)], ctypes.c_int
+    init.argtypes, init.restype = [ctypes.c_void_p], ctypes.c_int
+    set_mode.argtypes, set_mode.restype = [ctypes.c_void_p, ctypes.c_int], ctypes.c_int
+    process.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    process.restype = ctypes.c_int
+    free.argtypes, free.restype = [ctypes.c_void_p], None
+    return create, init, set_mode, process, free
+
+
+_webrtc_vad = _bind_webrtc_vad()
+if _webrtc_vad is not None:
+    _webrtc_vad_process = _webrtc_vad[3]
+    
+    # Not cached: the compiled call embeds the C function's address in this process
+    @njit
+    def _speech_flags_kernel(handle: int, sr: int, frames2d: np.ndarray, out: np.ndarray) -> None:
+        """WebRtcVad_Process over every frame row, with no Python call per frame."""
+        frame_size = frames2d.shape[1]
+        for k in range(frames2d.shape[0]):
+            out[k] = _webrtc_vad_process(handle, sr, frames2d[k].ctypes.data, frame_size)
+
+
+def _speech_flags(frames2d: np.ndarray, sr: int) -> List[bool]:
+    """
+    Run WebRTC VAD over whole int16 frames, one per row.
+    
+    segment_speech validates the sample rate and frame duration and slices
+    whole frames only, so the VAD has nothing to reject here.
+    """
+    # With NUMBA_DISABLE_JIT the kernel would run as a per-frame Python loop
+    if _webrtc_vad is None or numba_config.DISABLE_JIT:
+        return _speech_flags_python(frames2d, sr)
+    
+    create, init, set_mode, _, free = _webrtc_vad
+    # Fresh per recording: a VAD keeps hangover/noise state from earlier frames
+    handle = ctypes.c_void_p()
+    if create(ctypes.byref(handle)) != 0:
+        raise MemoryError("WebRtcVad_Create failed")
+    try:
+        if init(handle) != 0 or set_mode(handle, VAD_AGGRESSIVENESS) != 0:
+            raise RuntimeError("Failed to initialize WebRTC VAD")
+        results = np.empty(len(frames2d), dtype=np.int32)
+        _speech_flags_kernel(handle.value, sr, np.ascontiguousarray(frames2d), results)
+    finally:
+        free(handle)
+    
+    if (results < 0).any():
+        raise RuntimeError("Error while processing frame")
+    return (results == 1).tolist()
+
+
+def _speech_flags_python(frames2d: np.ndarray, sr: int) -> List[bool]:
+    """webrtcvad.Vad equivalent of _speech_flags, one Python call per frame."""
+    # Fresh per recording: a Vad keeps hangover/noise state from earlier frames
+    vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+    # Native-endian int16 PCM per row, the layout WebRTC VAD expects
+    return [vad.is_speech(row.tobytes(), sr) for row in frames2d]
+
+
+# Compile the kernel at process start instead of on the first request
+if os.environ.get("FEATURE_WARMUP") == "1":
+    _speech_flags(np.zeros((1, 480), dtype=np.int16), 16000)
+
+
+def segment_speech(audio: np.ndarray, sr: int, frame_duration_ms: int = 30) -> np.ndarray:
     """
     Segment audio into speech and silence regions using WebRTC VAD.
     
@@ -25,89 +177,67 @@ def segment_speech(audio: np.ndarray, sr: int, frame_duration_ms: int = 30) -> L
         frame_duration_ms: Frame duration in ms (10, 20, or 30)
         
     Returns:
-        List of segments with start_s, end_s, type
+        SEGMENT_DTYPE array of segments (start_s, end_s, is_speech)
     """
     # WebRTC VAD only supports specific sample rates
     if sr not in [8000, 16000, 32000, 48000]:
         raise ValueError(f"Sample rate {sr} not supported. Use 8000, 16000, 32000, or 48000")
+    if frame_duration_ms not in [10, 20, 30]:
+        raise ValueError(f"Frame duration {frame_duration_ms}ms not supported. Use 10, 20, or 30")
     
     # Convert float audio to int16
-    audio_int16 = (audio * 32767).astype(np.int16)
-    
-    # Initialize VAD
-    vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+    audio_int16 = _to_int16_pcm(audio)
     
-    # Calculate frame size
+    # Calculate frame size; the incomplete trailing frame is trimmed off
     frame_size = int(sr * frame_duration_ms / 1000)
+    n_frames = len(audio_int16) // frame_size
+    frames2d = audio_int16[:n_frames * frame_size].reshape(n_frames, frame_size)
     
-    # Process frames
-    segments = []
-    current_segment = None
-    vad_error_count = 0
+    # Digital silence (e.g. padding) is never speech, so skip the VAD for it.
+    # Only exact zeros: frames peaking at a few LSBs can already be flagged.
+    if not frames2d.any():
+        return np.array([(0.0, n_frames * frame_size / sr, False)] if n_frames else [], dtype=SEGMENT_DTYPE)
     
-    for i in range(0, len(audio_int16), frame_size):
-        frame = audio_int16[i:i + frame_size]
-        
-        # Skip incomplete frames
-        if len(frame) < frame_size:
-            break
-            
-        # Convert to bytes
-        frame_bytes = struct.pack("%dh" % len(frame), *frame)
-        
-        # Detect speech
-        try:
-            is_speech = vad.is_speech(frame_bytes, sr)
-        except Exception as e:
-            vad_error_count += 1
-            if vad_error_count <= 3:  # Log first few errors only
-                logger.warning(f"VAD error at frame {i}: {e}")
-            is_speech = False
-        
-        # Calculate time
-        start_time = i / sr
-        end_time = (i + frame_size) / sr
-        
-        # Build segments
-        if is_speech:
-            if current_segment is None or current_segment["type"] != "speech":
-                # Start new speech segment
-                if current_segment is not None:
-                    segments.append(current_segment)
-                current_segment = {
-                    "start_s": start_time,
-                    "end_s": end_time,
-                    "type": "speech"
-                }
-            else:
-                # Extend current speech segment
-                current_segment["end_s"] = end_time
-        else:
-            if current_segment is None or current_segment["type"] != "silence":
-                # Start new silence segment
-                if current_segment is not None:
-                    segments.append(current_segment)
-                current_segment = {
-                    "start_s": start_time,
-                    "end_s": end_time,
-                    "type": "silence"
-                }
-            else:
-                # Extend current silence segment
-                current_segment["end_s"] = end_time
-    
-    # Add last segment
-    if current_segment is not None:
-        segments.append(current_segment)
-    
-    # Log if there were many VAD errors
-    if vad_error_count > 3:
-        logger.warning(f"VAD encountered {vad_error_count} total errors during processing")
+    # Re-analysis of the same recording skips the VAD entirely
+    cache_key = (hashlib.blake2b(frames2d, digest_size=16).digest(), sr, frame_duration_ms)
+    with _segment_cache_lock:
+        cached = _segment_cache.get(cache_key)
+    if cached is not None:
+        return cached.copy()
     
+    segments = _build_segments(frames2d, sr, frame_size)
+    with _segment_cache_lock:
+        _segment_cache[cache_key] = segments.copy()
     return segments
 
 
-def compute_timing_metrics(segments: List[Dict], total_duration: float) -> Dict:
+def _build_segments(frames2d: np.ndarray, sr: int, frame_size: int) -> np.ndarray:
+    """Run VAD over whole int16 frames and merge equal-flag runs into segments."""
+    flags = np.asarray(_speech_flags(frames2d, sr), dtype=np.bool_)
+    if flags.size == 0:
+        return np.empty(0, dtype=SEGMENT_DTYPE)
+    
+    # Segments are runs of equal flags; boundaries are where the flag flips
+    boundaries = np.r_[0, np.flatnonzero(np.diff(flags.view(np.int8))) + 1, flags.size]
+    # Times come from sample offsets (sample / sr) in one vectorized divide
+    boundary_times = boundaries * frame_size / sr
+    
+    segments = np.empty(len(boundaries) - 1, dtype=SEGMENT_DTYPE)
+    segments["start_s"] = boundary_times[:-1]
+    segments["end_s"] = boundary_times[1:]
+    segments["is_speech"] = flags[boundaries[:-1]]
+    return segments
+
+
+def _pause_events(starts: np.ndarray, ends: np.ndarray, durations_ms: np.ndarray) -> List[Dict]:
+    """Pause event dicts for the selected silence segments, as plain floats."""
+    return [
+        {"start_s": start, "end_s": end, "duration_ms": duration_ms}
+        for start, end, duration_ms in zip(starts.tolist(), ends.tolist(), durations_ms.tolist())
+    ]
+
+
+def compute_timing_metrics(segments: Union[np.ndarray, List[Dict]], total_duration: float) -> Dict:
     """
     Compute timing metrics from VAD segments.
     
@@ -118,32 +248,32 @@ def compute_timing_metrics(segments: List[Dict], total_duration: float) -> Dict:
     Returns:
         Dictionary of timing metrics
     """
-    speech_duration = 0
-    silence_duration = 0
-    pause_events = []
+    # Columnar view of the segments so the reductions below run in NumPy
+    segments = _as_segment_array(segments)
+    starts = segments["start_s"]
+    ends = segments["end_s"]
+    is_speech = segments["is_speech"]
+    durations = ends - starts
     
-    for segment in segments:
-        duration = segment["end_s"] - segment["start_s"]
-        
-        if segment["type"] == "speech":
-            speech_duration += duration
-        else:
-            silence_duration += duration
-            pause_events.append({
-                "start_s": segment["start_s"],
-                "end_s": segment["end_s"],
-                "duration_ms": duration * 1000
-            })
+    speech_duration = float(durations[is_speech].sum())
+    silence_duration = float(durations[~is_speech].sum())
     
     # Filter meaningful pauses
-    meaningful_pauses = [p for p in pause_events if p["duration_ms"] > MEANINGFUL_PAUSE_MS]
-    long_pauses = [p for p in pause_events if p["duration_ms"] > LONG_PAUSE_MS]
+    pause_starts = starts[~is_speech]
+    pause_ends = ends[~is_speech]
+    pause_ms = durations[~is_speech] * 1000
+    meaningful = pause_ms > MEANINGFUL_PAUSE_MS
+    meaningful_pauses = _pause_events(pause_starts[meaningful], pause_ends[meaningful], pause_ms[meaningful])
+    # Long pauses are a subset of the meaningful ones (LONG_PAUSE_MS > MEANINGFUL_PAUSE_MS),
+    # so they share the same read-only event dicts
+    is_long = (pause_ms[meaningful] > LONG_PAUSE_MS).tolist()
+    long_pauses = [pause for pause, long in zip(meaningful_pauses, is_long) if long]
     
     # Calculate metrics
     speech_ratio = speech_duration / total_duration if total_duration > 0 else 0
     silence_ratio = silence_duration / total_duration if total_duration > 0 else 0
     pause_count = len(meaningful_pauses)
-    mean_pause_ms = np.mean([p["duration_ms"] for p in meaningful_pauses]) if meaningful_pauses else 0
+    mean_pause_ms = float(pause_ms[meaningful].mean()) if meaningful_pauses else 0
     
     return {
         "total_speech_ms": speech_duration * 1000,
@@ -157,7 +287,7 @@ def compute_timing_metrics(segments: List[Dict], total_duration: float) -> Dict:
     }
 
 
-def get_speech_only_audio(audio: np.ndarray, sr: int, segments: List[Dict]) -> np.ndarray:
+def get_speech_only_audio(audio: np.ndarray, sr: int, segments: Union[np.ndarray, List[Dict]]) -> np.ndarray:
     """
     Extract only speech portions from audio.
     
@@ -169,16 +299,15 @@ def get_speech_only_audio(audio: np.ndarray, sr: int, segments: List[Dict]) -> n
     Returns:
         Audio array containing only speech
     """
-    speech_segments = [s for s in segments if s["type"] == "speech"]
+    segments = _as_segment_array(segments)
+    speech_segments = segments[segments["is_speech"]]
     
-    if not speech_segments:
+    if not len(speech_segments):
         logger.warning("No speech segments found, returning full audio")
         return audio
     
-    speech_audio = []
-    for segment in speech_segments:
-        start_idx = int(segment["start_s"] * sr)
-        end_idx = int(segment["end_s"] * sr)
-        speech_audio.append(audio[start_idx:end_idx])
-    
-    return np.concatenate(speech_audio) if speech_audio else audio
+    # Slices are views, so concatenate copies each sample once into a single output
+    return np.concatenate([
+        audio[int(start * sr):int(end * sr)]
+        for start, end in zip(speech_segments["start_s"].tolist(), speech_segments["end_s"].tolist())
+    ])
@@ -7,38 +7,43 @@ Tests all backend endpoints with real API calls
 import requests
 import json
 import base64
+import orjson
 import time
 import os
 import uuid
 from datetime import datetime, timezone, timedelta
 from pymongo import MongoClient
+from concurrent_checks import run_concurrently
 
 # Configuration
 BACKEND_URL = "https://speak-assess-2.preview.emergentagent.com/api"
-TEST_USER_ID = str(uuid.uuid4())
+TEST_USER_ID = uuid.uuid4().hex
 MONGO_URL = "mongodb://localhost:27017"
 DB_NAME = "test_database"
 
+# One pooled keep-alive session, so the endpoints share a connection instead of a TLS handshake each
+SESSION = requests.Session()
+
 def create_mock_audio_base64():
     """Create a small mock audio file in base64 format for testing"""
     # Create a minimal WAV file header + some audio data
     # This is a very basic WAV file structure for testing
     wav_header = b'RIFF\x24\x08\x00\x00WAVEfmt \x10\x00\x00\x00\x01\x00\x01\x00\x44\xac\x00\x00\x88X\x01\x00\x02\x00\x10\x00data\x00\x08\x00\x00'
-    # Add some basic audio samples (silence)
-    audio_samples = b'\x00\x00' * 1000  # 1000 samples of silence
-    mock_audio = wav_header + audio_samples
+    # Header followed by 1000 samples of silence, in one zero-filled buffer
+    mock_audio = bytearray(len(wav_header) + 2 * 1000)
+    mock_audio[:len(wav_header)] = wav_header
     return base64.b64encode(mock_audio).decode('utf-8')
 
 def test_health_check():
     """Test GET /api/ - Health check endpoint"""
     print("\n=== Testing Health Check Endpoint ===")
     try:
-        response = requests.get(f"{BACKEND_URL}/")
+        response = SESSION.get(f"{BACKEND_URL}/")
         print(f"Status Code: {response.status_code}")
-        print(f"Response: {response.json()}")
+        data = orjson.loads(response.content)
+        print(f"Response: {data}")
         
         if response.status_code == 200:
-            data = response.json()
             if "message" in data and "Mirror Note" in data["message"]:
                 print("✅ Health check PASSED")
                 return True
@@ -68,21 +73,21 @@ def test_voice_analysis():
     
     try:
         print("Sending voice analysis request...")
-        response = requests.post(
+        response = SESSION.post(
             f"{BACKEND_URL}/analyze-voice",
             json=payload,
-            headers={"Content-Type": "application/json"},
             timeout=60  # Give it time for OpenAI processing
         )
         
         print(f"Status Code: {response.status_code}")
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             print(f"Response: {json.dumps(data, indent=2)}")
             
             # Check required fields
-            if all(key in data for key in ["assessment_id", "status", "message"]):
+            missing = {"assessment_id", "status", "message"} - data.keys()
+            if not missing:
                 assessment_id = data["assessment_id"]
                 status = data["status"]
                 
@@ -93,7 +98,7 @@ def test_voice_analysis():
                     print(f"⚠️ Voice analysis completed but status is: {status}")
                     return True, assessment_id
             else:
-                print("❌ Voice analysis FAILED - Missing required fields in response")
+                print(f"❌ Voice analysis FAILED - Missing required fields in response: {sorted(missing)}")
                 return False, None
         else:
             print(f"Response body: {response.text}")
@@ -112,11 +117,11 @@ def test_get_assessment(assessment_id):
     print(f"\n=== Testing Get Assessment Endpoint (ID: {assessment_id}) ===")
     
     try:
-        response = requests.get(f"{BACKEND_URL}/assessment/{assessment_id}")
+        response = SESSION.get(f"{BACKEND_URL}/assessment/{assessment_id}")
         print(f"Status Code: {response.status_code}")
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             print(f"Assessment data keys: {list(data.keys())}")
             
             # Check for required fields
@@ -137,11 +142,11 @@ def test_get_assessment(assessment_id):
                     print(f"Analysis keys: {list(analysis.keys())}")
                     
                     # Check key analysis fields
-                    analysis_fields = ["archetype", "overall_score", "clarity_score", "confidence_score"]
-                    if all(field in analysis for field in analysis_fields):
+                    missing = {"archetype", "overall_score", "clarity_score", "confidence_score"} - analysis.keys()
+                    if not missing:
                         print("✅ Analysis data complete")
                     else:
-                        print("⚠️ Some analysis fields missing")
+                        print(f"⚠️ Some analysis fields missing: {sorted(missing)}")
                 
                 # Check for training questions
                 if "training_questions" in data:
@@ -183,7 +188,7 @@ def test_error_scenarios():
     # Test 1: Invalid assessment ID
     print("\n--- Testing invalid assessment ID ---")
     try:
-        response = requests.get(f"{BACKEND_URL}/assessment/invalid-id-123")
+        response = SESSION.get(f"{BACKEND_URL}/assessment/invalid-id-123")
         if response.status_code == 404:
             print("✅ Invalid assessment ID properly returns 404")
         else:
@@ -198,10 +203,9 @@ def test_error_scenarios():
             "user_id": TEST_USER_ID,
             # Missing audio_base64, recording_mode, recording_time
         }
-        response = requests.post(
+        response = SESSION.post(
             f"{BACKEND_URL}/analyze-voice",
-            json=incomplete_payload,
-            headers={"Content-Type": "application/json"}
+            json=incomplete_payload
         )
         if response.status_code in [400, 422]:  # Bad request or validation error
             print("✅ Missing fields properly rejected")
@@ -217,19 +221,18 @@ def check_mongodb_connection():
     try:
         # Test creating a status check
         payload = {"client_name": "test_client_voice_assessment"}
-        response = requests.post(
+        response = SESSION.post(
             f"{BACKEND_URL}/status",
-            json=payload,
-            headers={"Content-Type": "application/json"}
+            json=payload
         )
         
         if response.status_code == 200:
             print("✅ MongoDB write operation successful")
             
             # Test reading status checks
-            response = requests.get(f"{BACKEND_URL}/status")
+            response = SESSION.get(f"{BACKEND_URL}/status")
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 print(f"✅ MongoDB read operation successful - {len(data)} records found")
                 return True
             else:
@@ -243,6 +246,18 @@ def check_mongodb_connection():
         print(f"❌ MongoDB connection test failed - Error: {str(e)}")
         return False
 
+def test_voice_analysis_and_retrieval():
+    """Voice analysis followed by retrieval of the assessment it created"""
+    analysis_success, assessment_id = test_voice_analysis()
+    
+    # Test 4: Get Assessment (if we have an assessment_id)
+    if assessment_id:
+        get_success = test_get_assessment(assessment_id)
+    else:
+        get_success = False
+        print("\n⚠️ Skipping assessment retrieval test - no assessment_id available")
+    return analysis_success, get_success
+
 def run_all_tests():
     """Run all backend tests"""
     print("🚀 Starting Backend API Tests for The Mirror Note")
@@ -259,24 +274,18 @@ def run_all_tests():
         "overall_success": False
     }
     
-    # Test 1: Health Check
-    results["health_check"] = test_health_check()
-    
-    # Test 2: MongoDB Connection
-    results["mongodb_connection"] = check_mongodb_connection()
-    
-    # Test 3: Voice Analysis (most critical)
-    analysis_success, assessment_id = test_voice_analysis()
-    results["voice_analysis"] = analysis_success
-    
-    # Test 4: Get Assessment (if we have an assessment_id)
-    if assessment_id:
-        results["get_assessment"] = test_get_assessment(assessment_id)
-    else:
-        print("\n⚠️ Skipping assessment retrieval test - no assessment_id available")
+    # The checks are independent, so run them side by side; each one's output
+    # is buffered and printed in order so the report reads as if run serially
+    outcomes = run_concurrently(
+        (test_health_check,),  # Test 1: Health Check
+        (check_mongodb_connection,),  # Test 2: MongoDB Connection
+        (test_voice_analysis_and_retrieval,),  # Tests 3-4 (most critical)
+        (test_error_scenarios,),  # Test 5: Error Scenarios
+    )
     
-    # Test 5: Error Scenarios
-    test_error_scenarios()
+    results["health_check"], results["mongodb_connection"], (
+        results["voice_analysis"], results["get_assessment"]
+    ), _ = outcomes
     
     # Overall Results
     print("\n" + "="*60)
@@ -4,170 +4,189 @@ Comprehensive Backend API Testing for The Mirror Note - Voice Assessment Platfor
 Tests all backend endpoints with proper authentication
 """
 
-import requests
+import httpx
+import importlib.util
 import json
 import base64
+import orjson
 import time
 import os
 import uuid
+from cachetools.func import ttl_cache
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
-from pymongo import MongoClient
+from functools import lru_cache
+from pymongo import MongoClient, UpdateOne
+from concurrent_checks import run_concurrently
 
 # Configuration
 BACKEND_URL = "https://speak-assess-2.preview.emergentagent.com/api"
-TEST_USER_ID = str(uuid.uuid4())
+# Stable across runs so a kept fixture can be found again (and re-upserted without clashing on email)
+TEST_USER_ID = uuid.uuid5(uuid.NAMESPACE_OID, "mirrornote-testfixture-v1").hex
+# Set MIRRORNOTE_TEST_CLEANUP=1 to also remove the test users and sessions; by default re-runs reuse them
+CLEANUP = os.environ.get("MIRRORNOTE_TEST_CLEANUP") == "1"
 MONGO_URL = "mongodb://localhost:27017"
 DB_NAME = "test_database"
 
-def setup_test_user_with_auth():
-    """Create a test user and session directly in MongoDB for testing authenticated endpoints"""
-    print("\n=== Setting up Test User with Authentication ===")
+# One pooled client: with httpx[http2] (the h2 package) installed, requests multiplex over a shared
+# HTTP/2 connection and HPACK compresses the repeated Authorization headers; otherwise it stays on
+# HTTP/1.1 keep-alive. Retries only cover failed connects.
+# Every call gets a 2s connect / 10s read bound so a dead host cannot stall the suite.
+HTTP2 = importlib.util.find_spec("h2") is not None
+CLIENT = httpx.Client(
+    transport=httpx.HTTPTransport(http2=HTTP2, retries=2, limits=httpx.Limits(max_connections=20, max_keepalive_connections=10)),
+    timeout=httpx.Timeout(10.0, connect=2.0),
+    follow_redirects=True
+)
+
+# One pooled MongoDB client for setup and cleanup; it connects lazily and is thread-safe
+MONGO_CLIENT = MongoClient(MONGO_URL, maxPoolSize=10)
+db = MONGO_CLIENT[DB_NAME]
+
+def setup_test_users():
+    """
+    Create the free and premium test users and their sessions directly in MongoDB
+    for testing authenticated endpoints and usage limits, or reuse them if a
+    previous run left both sessions unexpired.
+    Returns (session_token, premium_session_token, premium_user_id).
+    """
+    print("\n=== Setting up Test Users with Authentication ===")
     
     try:
-        # Connect to MongoDB
-        client = MongoClient(MONGO_URL)
-        db = client[DB_NAME]
+        premium_user_id = f"{TEST_USER_ID}_premium"
+        now = datetime.now(timezone.utc)
+        expires_at = now + timedelta(days=7)
+        
+        # One indexed lookup for both sessions; skip the upserts if the fixture is still valid
+        existing = {
+            session["user_id"]: session["session_token"]
+            for session in db.user_sessions.find(
+                {"user_id": {"$in": [TEST_USER_ID, premium_user_id]}, "expires_at": {"$gt": now}},
+                {"_id": 0, "user_id": 1, "session_token": 1}
+            )
+        }
+        if TEST_USER_ID in existing and premium_user_id in existing:
+            print(f"✅ Reusing test users from a previous run: {existing[TEST_USER_ID][:20]}...")
+            return existing[TEST_USER_ID], existing[premium_user_id], premium_user_id
         
-        # Create test user
+        # Free user for the authenticated endpoints, premium user for usage limits
         test_user = {
             "id": TEST_USER_ID,
             "email": "testuser@mirrornote.com",
             "name": "Test User",
             "picture": None,
             "isPremium": False,
-            "created_at": datetime.now(timezone.utc)
+            "created_at": now
         }
-        
-        # Insert or update user
-        db.users.update_one(
-            {"id": TEST_USER_ID},
-            {"$set": test_user},
-            upsert=True
-        )
-        
-        # Create session token
-        session_token = f"test_session_{uuid.uuid4()}"
-        expires_at = datetime.now(timezone.utc) + timedelta(days=7)
-        
-        # Create session
-        db.user_sessions.update_one(
-            {"user_id": TEST_USER_ID},
-            {"$set": {
-                "user_id": TEST_USER_ID,
-                "session_token": session_token,
-                "expires_at": expires_at,
-                "created_at": datetime.now(timezone.utc)
-            }},
-            upsert=True
-        )
-        
-        client.close()
-        
-        print(f"✅ Test user created: {test_user['email']}")
-        print(f"✅ Session token created: {session_token[:20]}...")
-        
-        return session_token
-        
-    except Exception as e:
-        print(f"❌ Failed to setup test user: {str(e)}")
-        return None
-
-def create_premium_test_user():
-    """Create a premium test user for testing usage limits"""
-    print("\n=== Setting up Premium Test User ===")
-    
-    try:
-        client = MongoClient(MONGO_URL)
-        db = client[DB_NAME]
-        
-        premium_user_id = f"{TEST_USER_ID}_premium"
-        
-        # Create premium user
         premium_user = {
             "id": premium_user_id,
             "email": "premium@mirrornote.com",
             "name": "Premium Test User",
             "picture": None,
             "isPremium": True,
-            "created_at": datetime.now(timezone.utc)
+            "created_at": now
         }
-        
-        db.users.update_one(
-            {"id": premium_user_id},
-            {"$set": premium_user},
-            upsert=True
-        )
-        
-        # Create session for premium user
-        premium_session_token = f"premium_session_{uuid.uuid4()}"
-        expires_at = datetime.now(timezone.utc) + timedelta(days=7)
-        
-        db.user_sessions.update_one(
-            {"user_id": premium_user_id},
-            {"$set": {
-                "user_id": premium_user_id,
-                "session_token": premium_session_token,
+        session_token = f"test_session_{uuid.uuid4().hex}"
+        premium_session_token = f"premium_session_{uuid.uuid4().hex}"
+        
+        # Insert or update both users, then both sessions: one round-trip per collection
+        db.users.bulk_write([
+            UpdateOne({"id": user["id"]}, {"$set": user}, upsert=True)
+            for user in (test_user, premium_user)
+        ], ordered=False)
+        db.user_sessions.bulk_write([
+            UpdateOne({"user_id": user_id}, {"$set": {
+                "user_id": user_id,
+                "session_token": token,
                 "expires_at": expires_at,
-                "created_at": datetime.now(timezone.utc)
-            }},
-            upsert=True
-        )
+                "created_at": now
+            }}, upsert=True)
+            for user_id, token in ((TEST_USER_ID, session_token), (premium_user_id, premium_session_token))
+        ], ordered=False)
         
-        client.close()
+        print("\n".join([
+            f"✅ Test user created: {test_user['email']}",
+            f"✅ Session token created: {session_token[:20]}...",
+            f"✅ Premium user created: {premium_user['email']}"
+        ]))
         
-        print(f"✅ Premium user created: {premium_user['email']}")
-        return premium_session_token, premium_user_id
+        return session_token, premium_session_token, premium_user_id
         
     except Exception as e:
-        print(f"❌ Failed to setup premium user: {str(e)}")
-        return None, None
+        print(f"❌ Failed to setup test users: {str(e)}")
+        return None, None, None
+
+@lru_cache(maxsize=8)
+def _auth_headers(token):
+    """The Authorization header dict for a session token, built once and shared by every request"""
+    return {"Authorization": f"Bearer {token}"}
+
+@lru_cache(maxsize=1)
+def _get_root():
+    """GET / once per interpreter; re-entering the suite reuses the response"""
+    # Cheap HEAD first so an unreachable host fails in seconds; any status means it is up
+    CLIENT.head(f"{BACKEND_URL}/", timeout=2.0)
+    return CLIENT.get(f"{BACKEND_URL}/")
+
+@lru_cache(maxsize=8)
+def _get_me(token=None):
+    """GET /auth/me once per session token (None sends no Authorization header)"""
+    headers = _auth_headers(token) if token else {}
+    return CLIENT.get(f"{BACKEND_URL}/auth/me", headers=headers)
 
 def test_basic_connectivity():
     """Test basic API connectivity"""
     print("\n=== Testing Basic Connectivity ===")
     try:
-        response = requests.get(f"{BACKEND_URL}/")
+        response = _get_root()
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             print(f"✅ API accessible: {data.get('message', 'OK')}")
             return True
         else:
             print(f"❌ HTTP {response.status_code}: {response.text}")
             return False
+    except httpx.TransportError as e:
+        print(f"❌ Backend unreachable: {str(e)}")
+        return False
     except Exception as e:
         print(f"❌ Connection failed: {str(e)}")
         return False
 
 def test_auth_endpoints(session_token):
-    """Test authentication endpoints"""
+    """Test authentication endpoints (logout is tested separately, once the session is done with)"""
     print("\n=== Testing Authentication Endpoints ===")
     
+    # Both /auth/me probes are independent, so they go out together
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        me_auth = pool.submit(_get_me, session_token)
+        me_noauth = pool.submit(_get_me)
+    
     # Test /api/auth/me with valid session
     print("\n--- Testing /api/auth/me with valid session ---")
     try:
-        headers = {"Authorization": f"Bearer {session_token}"}
-        response = requests.get(f"{BACKEND_URL}/auth/me", headers=headers)
+        response = me_auth.result()
         
         if response.status_code == 200:
-            user_data = response.json()
+            user_data = orjson.loads(response.content)
             print(f"✅ Auth /me endpoint working: {user_data.get('email', 'Unknown')}")
             if user_data.get('id') == TEST_USER_ID:
                 print("✅ Correct user data returned")
-                return True
+                success = True
             else:
                 print("⚠️ User ID mismatch in response")
-                return False
+                success = False
         else:
             print(f"❌ Auth /me failed: {response.status_code} - {response.text}")
-            return False
+            success = False
     except Exception as e:
         print(f"❌ Auth /me test failed: {str(e)}")
-        return False
+        success = False
     
     # Test /api/auth/me without session
     print("\n--- Testing /api/auth/me without session ---")
     try:
-        response = requests.get(f"{BACKEND_URL}/auth/me")
+        response = me_noauth.result()
         if response.status_code == 401:
             print("✅ Auth /me properly rejects unauthenticated requests")
         else:
@@ -175,11 +194,16 @@ def test_auth_endpoints(session_token):
     except Exception as e:
         print(f"❌ Auth /me unauthenticated test failed: {str(e)}")
     
-    # Test logout
+    return success
+
+def test_logout(session_token):
+    """Test logout; ends the session, so it runs after every other authenticated test"""
     print("\n--- Testing /api/auth/logout ---")
     try:
-        headers = {"Authorization": f"Bearer {session_token}"}
-        response = requests.post(f"{BACKEND_URL}/auth/logout", headers=headers)
+        headers = _auth_headers(session_token)
+        response = CLIENT.post(f"{BACKEND_URL}/auth/logout", headers=headers)
+        # The session is gone now, so a cached /auth/me for it would be stale
+        _get_me.cache_clear()
         if response.status_code == 200:
             print("✅ Logout endpoint working")
         else:
@@ -187,6 +211,11 @@ def test_auth_endpoints(session_token):
     except Exception as e:
         print(f"❌ Logout test failed: {str(e)}")
 
+@ttl_cache(maxsize=8, ttl=2.0)
+def _get_usage(token):
+    """GET /usage per session token, reused for a couple of seconds within a run"""
+    return CLIENT.get(f"{BACKEND_URL}/usage", headers=_auth_headers(token))
+
 def test_usage_endpoints(session_token, premium_session_token=None, premium_user_id=None):
     """Test usage tracking endpoints"""
     print("\n=== Testing Usage Tracking Endpoints ===")
@@ -194,11 +223,10 @@ def test_usage_endpoints(session_token, premium_session_token=None, premium_user
     # Test usage endpoint for free user
     print("\n--- Testing /api/usage for free user ---")
     try:
-        headers = {"Authorization": f"Bearer {session_token}"}
-        response = requests.get(f"{BACKEND_URL}/usage", headers=headers)
+        response = _get_usage(session_token)
         
         if response.status_code == 200:
-            usage_data = response.json()
+            usage_data = orjson.loads(response.content)
             print(f"✅ Usage endpoint working for free user")
             print(f"   Plan: {usage_data.get('plan', 'Unknown')}")
             print(f"   Used: {usage_data.get('used', 0)}")
@@ -221,11 +249,10 @@ def test_usage_endpoints(session_token, premium_session_token=None, premium_user
     if premium_session_token and premium_user_id:
         print("\n--- Testing /api/usage for premium user ---")
         try:
-            headers = {"Authorization": f"Bearer {premium_session_token}"}
-            response = requests.get(f"{BACKEND_URL}/usage", headers=headers)
+            response = _get_usage(premium_session_token)
             
             if response.status_code == 200:
-                usage_data = response.json()
+                usage_data = orjson.loads(response.content)
                 print(f"✅ Usage endpoint working for premium user")
                 print(f"   Plan: {usage_data.get('plan', 'Unknown')}")
                 print(f"   Monthly Used: {usage_data.get('monthly_used', 0)}")
@@ -240,50 +267,48 @@ def test_usage_endpoints(session_token, premium_session_token=None, premium_user
         except Exception as e:
             print(f"❌ Premium usage endpoint test failed: {str(e)}")
 
+# A minimal WAV file header + 500 samples of silence, encoded once at import
+_WAV_HEADER = b'RIFF\x24\x08\x00\x00WAVEfmt \x10\x00\x00\x00\x01\x00\x01\x00\x44\xac\x00\x00\x88X\x01\x00\x02\x00\x10\x00data\x08\x00\x00\x00'
+_MOCK_AUDIO_BASE64 = base64.b64encode(_WAV_HEADER + bytes(2 * 500)).decode('ascii')
+
 def create_mock_audio_base64():
-    """Create a small mock audio file in base64 format for testing"""
-    # Create a minimal WAV file header + some audio data
-    wav_header = b'RIFF\x24\x08\x00\x00WAVEfmt \x10\x00\x00\x00\x01\x00\x01\x00\x44\xac\x00\x00\x88X\x01\x00\x02\x00\x10\x00data\x08\x00\x00\x00'
-    # Add some basic audio samples (silence)
-    audio_samples = b'\x00\x00' * 500  # 500 samples of silence
-    mock_audio = wav_header + audio_samples
-    return base64.b64encode(mock_audio).decode('utf-8')
+    """Small mock audio file in base64 format for testing"""
+    return _MOCK_AUDIO_BASE64
+
+# The voice analysis body never changes, so it is serialized once too
+_VOICE_PAYLOAD_BYTES = orjson.dumps({
+    "audio_base64": _MOCK_AUDIO_BASE64,
+    "user_id": TEST_USER_ID,
+    "recording_mode": "free_speaking",
+    "recording_time": 30
+})
 
 def test_voice_analysis_authenticated(session_token):
     """Test voice analysis with authentication"""
     print("\n=== Testing Voice Analysis with Authentication ===")
     
-    # Create test payload
-    mock_audio = create_mock_audio_base64()
-    payload = {
-        "audio_base64": mock_audio,
-        "user_id": TEST_USER_ID,
-        "recording_mode": "free_speaking",
-        "recording_time": 30
-    }
-    
     try:
         print("Sending authenticated voice analysis request...")
-        headers = {
-            "Authorization": f"Bearer {session_token}",
-            "Content-Type": "application/json"
-        }
+        headers = {**_auth_headers(session_token), "Content-Type": "application/json"}
         
-        response = requests.post(
+        response = CLIENT.post(
             f"{BACKEND_URL}/analyze-voice",
-            json=payload,
+            content=_VOICE_PAYLOAD_BYTES,
             headers=headers,
-            timeout=60  # Give it time for OpenAI processing
+            timeout=httpx.Timeout(60.0, connect=2.0)  # Give it time for OpenAI processing
         )
         
         print(f"Status Code: {response.status_code}")
         
         if response.status_code == 200:
-            data = response.json()
+            # This analysis counted against the user's quota, so cached /usage is stale
+            _get_usage.cache_clear()
+            data = orjson.loads(response.content)
             print(f"Response: {json.dumps(data, indent=2)}")
             
             # Check required fields
-            if all(key in data for key in ["assessment_id", "status", "message"]):
+            missing = {"assessment_id", "status", "message"} - data.keys()
+            if not missing:
                 assessment_id = data["assessment_id"]
                 status = data["status"]
                 
@@ -294,11 +319,11 @@ def test_voice_analysis_authenticated(session_token):
                     print(f"⚠️ Voice analysis completed but status is: {status}")
                     return True, assessment_id
             else:
-                print("❌ Voice analysis FAILED - Missing required fields in response")
+                print(f"❌ Voice analysis FAILED - Missing required fields in response: {sorted(missing)}")
                 return False, None
         elif response.status_code == 403:
             # Usage limit exceeded
-            error_detail = response.json().get('detail', {})
+            error_detail = orjson.loads(response.content).get('detail', {})
             if isinstance(error_detail, dict) and 'usage' in error_detail:
                 print("⚠️ Voice analysis blocked due to usage limits (expected for testing)")
                 print(f"   Usage: {error_detail['usage']}")
@@ -311,7 +336,7 @@ def test_voice_analysis_authenticated(session_token):
             print(f"❌ Authenticated voice analysis FAILED - Status code: {response.status_code}")
             return False, None
             
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         print("❌ Voice analysis FAILED - Request timeout (OpenAI processing may be slow)")
         return False, None
     except Exception as e:
@@ -322,34 +347,38 @@ def test_assessment_endpoints_authenticated(session_token, assessment_id=None):
     """Test assessment endpoints with authentication"""
     print("\n=== Testing Assessment Endpoints with Authentication ===")
     
+    # The list and the specific assessment are independent reads, so fetch them together
+    headers = _auth_headers(session_token)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        listing = pool.submit(CLIENT.get, f"{BACKEND_URL}/assessments", headers=headers)
+        detail = pool.submit(CLIENT.get, f"{BACKEND_URL}/assessment/{assessment_id}", headers=headers) if assessment_id else None
+    
     # Test get assessments list
     print("\n--- Testing /api/assessments ---")
     try:
-        headers = {"Authorization": f"Bearer {session_token}"}
-        response = requests.get(f"{BACKEND_URL}/assessments", headers=headers)
+        response = listing.result()
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             print(f"✅ Assessments list endpoint working")
             print(f"   Total assessments: {data.get('total', 0)}")
             print(f"   Assessments in response: {len(data.get('assessments', []))}")
-            return True
+            success = True
         else:
             print(f"❌ Assessments list failed: {response.status_code} - {response.text}")
-            return False
+            success = False
     except Exception as e:
         print(f"❌ Assessments list test failed: {str(e)}")
-        return False
+        success = False
     
     # Test get specific assessment if we have an ID
-    if assessment_id:
+    if detail:
         print(f"\n--- Testing /api/assessment/{assessment_id} ---")
         try:
-            headers = {"Authorization": f"Bearer {session_token}"}
-            response = requests.get(f"{BACKEND_URL}/assessment/{assessment_id}", headers=headers)
+            response = detail.result()
             
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 print(f"✅ Specific assessment endpoint working")
                 print(f"   Assessment ID: {data.get('assessment_id', 'Unknown')}")
                 print(f"   Processed: {data.get('processed', False)}")
@@ -362,13 +391,14 @@ def test_assessment_endpoints_authenticated(session_token, assessment_id=None):
                         print(f"   ✅ Training questions present: {len(data.get('training_questions', []))}")
                 else:
                     print("   ⚠️ Assessment not yet processed")
-                return True
             else:
                 print(f"❌ Specific assessment failed: {response.status_code} - {response.text}")
-                return False
+                success = False
         except Exception as e:
             print(f"❌ Specific assessment test failed: {str(e)}")
-            return False
+            success = False
+    
+    return success
 
 def test_payment_endpoints_authenticated(session_token):
     """Test payment endpoints with authentication"""
@@ -377,13 +407,13 @@ def test_payment_endpoints_authenticated(session_token):
     # Test create order
     print("\n--- Testing /api/payment/create-order ---")
     try:
-        headers = {"Authorization": f"Bearer {session_token}"}
-        response = requests.post(f"{BACKEND_URL}/payment/create-order", 
+        headers = _auth_headers(session_token)
+        response = CLIENT.post(f"{BACKEND_URL}/payment/create-order", 
                                params={"plan_type": "standard"}, 
                                headers=headers)
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             print("✅ Payment create order endpoint working")
             print(f"   Order ID: {data.get('order_id', 'Unknown')}")
             print(f"   Amount: ₹{data.get('amount', 0) / 100}")
@@ -404,20 +434,20 @@ def test_payment_endpoints_authenticated(session_token):
     # Test verify payment (will fail with invalid data, but tests endpoint structure)
     print("\n--- Testing /api/payment/verify ---")
     try:
-        headers = {"Authorization": f"Bearer {session_token}"}
+        headers = _auth_headers(session_token)
         test_payment_data = {
             "order_id": "test_order_123",
             "payment_id": "test_payment_123",
             "signature": "test_signature_123"
         }
         
-        response = requests.post(f"{BACKEND_URL}/payment/verify", 
+        response = CLIENT.post(f"{BACKEND_URL}/payment/verify", 
                                json=test_payment_data, 
                                headers=headers)
         
         # We expect this to fail with signature verification error
         if response.status_code == 400:
-            error_detail = response.json().get('detail', '')
+            error_detail = orjson.loads(response.content).get('detail', '')
             if 'signature' in error_detail.lower():
                 print("✅ Payment verify endpoint working (correctly rejects invalid signature)")
             else:
@@ -436,19 +466,18 @@ def test_mongodb_connection():
     try:
         # Test creating a status check
         payload = {"client_name": "test_client_comprehensive"}
-        response = requests.post(
+        response = CLIENT.post(
             f"{BACKEND_URL}/status",
-            json=payload,
-            headers={"Content-Type": "application/json"}
+            json=payload
         )
         
         if response.status_code == 200:
             print("✅ MongoDB write operation successful")
             
             # Test reading status checks
-            response = requests.get(f"{BACKEND_URL}/status")
+            response = CLIENT.get(f"{BACKEND_URL}/status")
             if response.status_code == 200:
-                data = response.json()
+                data = orjson.loads(response.content)
                 print(f"✅ MongoDB read operation successful - {len(data)} records found")
                 return True
             else:
@@ -462,21 +491,34 @@ def test_mongodb_connection():
         print(f"❌ MongoDB connection test failed - Error: {str(e)}")
         return False
 
-def cleanup_test_data():
-    """Clean up test data from MongoDB"""
+def cleanup_test_data(remove_users=False):
+    """
+    Clean up test data from MongoDB. Assessments and training questions always go, so the
+    kept free user never runs into its lifetime assessment limit; users and sessions only
+    go when remove_users is set.
+    """
     print("\n=== Cleaning up test data ===")
     
     try:
-        client = MongoClient(MONGO_URL)
-        db = client[DB_NAME]
+        # Exact ids match on the server's indexes instead of scanning with a regex
+        user_ids = [TEST_USER_ID, f"{TEST_USER_ID}_premium"]
+        # Training questions are keyed by assessment_id, so collect those before the assessments go
+        assessment_ids = db.assessments.distinct("assessment_id", {"user_id": {"$in": user_ids}})
+        
+        # Remove the run's assessments and training questions (and the users and sessions if asked) side by side
+        deletes = [
+            (db.assessments, {"user_id": {"$in": user_ids}}),
+            (db.training_questions, {"assessment_id": {"$in": assessment_ids}}),
+        ]
+        if remove_users:
+            deletes += [
+                (db.users, {"id": {"$in": user_ids}}),
+                (db.user_sessions, {"user_id": {"$in": user_ids}}),
+            ]
+        with ThreadPoolExecutor(max_workers=len(deletes)) as pool:
+            for future in [pool.submit(collection.delete_many, query) for collection, query in deletes]:
+                future.result()
         
-        # Remove test users and sessions
-        db.users.delete_many({"id": {"$regex": TEST_USER_ID}})
-        db.user_sessions.delete_many({"user_id": {"$regex": TEST_USER_ID}})
-        db.assessments.delete_many({"user_id": {"$regex": TEST_USER_ID}})
-        db.training_questions.delete_many({"assessment_id": {"$regex": TEST_USER_ID}})
-        
-        client.close()
         print("✅ Test data cleaned up")
         
     except Exception as e:
@@ -484,6 +526,14 @@ def cleanup_test_data():
 
 def run_comprehensive_tests():
     """Run all comprehensive backend tests"""
+    try:
+        return _run_comprehensive_tests()
+    finally:
+        CLIENT.close()
+        MONGO_CLIENT.close()
+
+def _run_comprehensive_tests():
+    """Body of run_comprehensive_tests, which closes the shared connections afterwards"""
     print("🚀 Starting Comprehensive Backend API Tests for The Mirror Note")
     print(f"📍 Testing against: {BACKEND_URL}")
     print(f"🆔 Test User ID: {TEST_USER_ID}")
@@ -508,36 +558,42 @@ def run_comprehensive_tests():
         print("❌ Basic connectivity failed. Stopping tests.")
         return results
     
-    # Test 2: MongoDB connection
-    results["mongodb_connection"] = test_mongodb_connection()
-    
-    # Test 3: Setup authentication
-    session_token = setup_test_user_with_auth()
-    premium_session_token, premium_user_id = create_premium_test_user()
+    # Test 2: MongoDB connection, alongside Test 3: Setup authentication
+    results["mongodb_connection"], (session_token, premium_session_token, premium_user_id) = run_concurrently(
+        (test_mongodb_connection,),
+        (setup_test_users,),
+    )
     
     if session_token:
         results["auth_setup"] = True
         
-        # Test 4: Authentication endpoints
-        results["auth_endpoints"] = test_auth_endpoints(session_token)
-        
-        # Test 5: Usage endpoints
-        results["usage_endpoints"] = test_usage_endpoints(session_token, premium_session_token, premium_user_id)
+        # Test 4: Authentication endpoints, alongside Test 5: Usage endpoints
+        # (usage is read before voice analysis below adds to it)
+        results["auth_endpoints"], results["usage_endpoints"] = run_concurrently(
+            (test_auth_endpoints, session_token),
+            (test_usage_endpoints, session_token, premium_session_token, premium_user_id),
+        )
         
-        # Test 6: Voice analysis (most critical)
-        voice_success, assessment_id = test_voice_analysis_authenticated(session_token)
+        # Test 6: Voice analysis (most critical), alongside Test 8: Payment endpoints
+        (voice_success, assessment_id), results["payment_endpoints"] = run_concurrently(
+            (test_voice_analysis_authenticated, session_token),
+            (test_payment_endpoints_authenticated, session_token),
+        )
         results["voice_analysis"] = voice_success
         
-        # Test 7: Assessment endpoints
+        # Test 7: Assessment endpoints (needs the assessment_id from Test 6)
         results["assessment_endpoints"] = test_assessment_endpoints_authenticated(session_token, assessment_id)
         
-        # Test 8: Payment endpoints
-        results["payment_endpoints"] = test_payment_endpoints_authenticated(session_token)
+        # Logout destroys the session a kept fixture would reuse, so only test it when cleaning up
+        if CLEANUP:
+            test_logout(session_token)
     else:
         print("❌ Failed to setup authentication. Skipping authenticated tests.")
     
     # Cleanup
-    cleanup_test_data()
+    cleanup_test_data(remove_users=CLEANUP)
+    if not CLEANUP:
+        print("ℹ️ Keeping test users for the next run (set MIRRORNOTE_TEST_CLEANUP=1 to remove them)")
     
     # Overall Results
     print("\n" + "="*80)
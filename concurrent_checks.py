@@ -0,0 +1,50 @@
+"""
+Run independent backend test checks side by side while keeping their output in order.
+Shared by backend_test.py and backend_test_comprehensive.py.
+"""
+
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class ThreadBufferedStdout:
+    """Stdout that collects each worker thread's prints into its own buffer"""
+    
+    def __init__(self, stream):
+        self._stream = stream
+        self._local = threading.local()
+    
+    def write(self, text):
+        return getattr(self._local, "buffer", self._stream).write(text)
+    
+    def flush(self):
+        self._stream.flush()
+    
+    def run(self, fn, *args):
+        """Run fn with its prints buffered; returns (result, printed output)"""
+        self._local.buffer = io.StringIO()
+        try:
+            return fn(*args), self._local.buffer.getvalue()
+        finally:
+            del self._local.buffer
+
+def run_concurrently(*calls):
+    """
+    Run independent (fn, *args) calls side by side and return their results.
+    Each call's output is printed in argument order, as if they had run serially.
+    """
+    real_stdout = sys.stdout
+    stdout = ThreadBufferedStdout(real_stdout)
+    sys.stdout = stdout
+    try:
+        with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+            futures = [pool.submit(stdout.run, *call) for call in calls]
+            results = []
+            for future in futures:
+                result, output = future.result()
+                real_stdout.write(output)
+                results.append(result)
+            return results
+    finally:
+        sys.stdout = real_stdout